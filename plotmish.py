@@ -27,17 +27,16 @@ www.pygame.org/
 by: Misha Schwartz
 '''
 
-import pygame, sys, argparse, os, re, csv, math, copy, time
+import pygame, sys, argparse, os, re, csv, math, time, multiprocessing
 from os.path import isdir, isfile, join, basename
-from glob import glob
+from fnmatch import fnmatch
 from subprocess import call, Popen
 if isdir('plotmish'):
     os.chdir('plotmish')
 sys.path.append('support_scripts')
-import pygbutton, inputbox, mapToCelex, plotmishClasses
+import pygbutton, inputbox, mapToCelex, plotmishClasses, tokenStore, pitchTrack, cmuLookup, corpusManifest, tokenGrid, tokenLayer, plotLayers, fileWatch, visibility, ellipses, density, undoJournal, correctionJournal, correctionStore, perfTrace
 from pygame.locals import *
-try: import numpy as np
-except: print >> sys.stderr, 'can\'t find numpy, will not be able to draw ellipses' 
+import numpy as np
 
 
 # parse in arguments from the command line
@@ -51,8 +50,19 @@ parser.add_argument('-a',  action = 'store_true', help = 'append to older log fi
 parser.add_argument('-p', metavar = 'Praat', default = '/Applications/Praat.app', help = 'change path to Praat application, default is /Applications/Praat.app')
 parser.add_argument('-f0', metavar = 'pitch tracks', default = '', help = 'folder containing pre-generated pitch tracks for each sound file')
 parser.add_argument('-c',metavar = 'celex dict',  default = '' , help = 'path to epw.cd celex dictionary file, will then run in celex mode, default is ARPABET mode')
+parser.add_argument('-j', metavar = 'processes', type = int, default = 1, help = 'number of processes to load formant.txt files with, 0 uses all cores, default is 1')
+parser.add_argument('-s', action = 'store_true', help = 'speaker mode: only load and display one speaker (wav file) at a time, use page up/page down to change speakers')
+parser.add_argument('-m', metavar = 'memory', type = int, default = 500, help = 'memory (MB) to keep speakers that are not displayed loaded in speaker mode, default is 500')
+parser.add_argument('-e', metavar = 'export folder', default = '', help = 'write a png of the vowel plot of each speaker (wav file) to this folder without opening the plotmish window (in parallel with -j processes)')
+parser.add_argument('-ev', metavar = 'export vowels', default = '', help = 'comma separated arpabet vowels to show in the exported plots, default is all vowels')
+parser.add_argument('-es', metavar = 'export std dev', type = int, default = 0, help = 'draw an ellipse of this many standard deviations for each vowel in the exported plots, default is no ellipses')
+parser.add_argument('-d', metavar = 'density', type = int, default = 20000, help = 'draw a density map of the vowels instead of each vowel when more than this many are displayed (zoom in to see the vowels), 0 always draws each vowel, default is 20000')
+parser.add_argument('-t', action = 'store_true', help = 'time plotmish from the start, including loading the files (control+T turns timing on and off, see Timing in the README)')
 args = parser.parse_args()
 
+# plots are exported offscreen, there is no window to open
+if args.e: os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
 # check celex mode has access to celex dict 
 if args.c:
     #set path to epw.cd celex dict 
@@ -61,15 +71,24 @@ if args.c:
     except:
         print >> sys.stderr , 'Cannot read %r \nPlease change file path' % args.c
 
-#make new save file for celex prons if it doesn't already
-#exist otherwise read from the save File:
-celStore = join('support_scripts','celexStore.txt')
+#save file for celex prons (made if it doesn't already exist, mappings
+#are looked up from it when needed). Mappings in the old text save file
+#are copied into a new save file
+celStore = join('support_scripts','celexStore.db')
+oldCelStore = join('support_scripts','celexStore.txt')
+
+# folder to write parsed formant.txt files and pitch tracks to (so
+# unchanged files don't have to be read again next time)
+cacheDir = 'cache'
 
+# lists of the files in the corpus folders (see corpusManifest)
+manifest = corpusManifest.Manifest(cacheDir)
+# corrections saved by every annotator (see support_scripts/correctionStore.py)
+correctionDB = correctionStore.CorrectionStore(args.o)
+# timing of the parts of plotmish (turned on and off with control+T, see support_scripts/perfTrace.py)
+trace = perfTrace.PerfTrace('traces')
 
-if isfile(celStore):
-    saveDict = mapToCelex.readSaved(celStore)
-else:
-    mapToCelex.newSaveFile(celStore)
+mapToCelex.openSaved(celStore, oldCelStore)
 
 
 
@@ -92,6 +111,9 @@ boldButtonFont = pygame.font.SysFont('courier', 16, bold = True)
 ctrl = [K_RCTRL, K_LCTRL] 
 shft = [K_RSHIFT, K_LSHIFT]
 
+#event posted when praat writes the praatLog file (see fileWatch)
+PRAATLOG = USEREVENT
+
 #set default black and white colours
 WHITE = (255, 255, 255, 0)
 BLACK = (0, 0, 0)
@@ -114,41 +136,40 @@ colours =   {'AA': (127, 255, 212, 255),
              'UH': (255, 105, 180, 255),
              'UW': (120, 120, 120, 255)}
 
+# captions of the vowel tokens and of the original measurement when remeasuring
+# (every token shares the same caption string)
+vowelCaption = '►'.decode('utf8')
+origCaption = '◉'.decode('utf8')
+
+# approximate memory used by the view, button and list entry of each vowel token (bytes)
+tokenBytes = sys.getsizeof(plotmishClasses.vowelView(None, 0)) + sys.getsizeof(tokenLayer.TokenMark(None, vowelCaption, BLACK, BLACK)) + 8
+
 # cmu/arpabet vowels
 arpVowels =  ('AA',  'IY',  'AE',  'EH',  'AH',  'UW',  'OY',  'AO',
               'UH', 'IH',  'OW',  'EY',  'IW',  'AW',  'AY',  'ER') 
 
-def writeLogs(plot):
-    # write to new log file or append to old one
-    
-    #only overwrite files if this is the first time writing this session
-    if plot.firstSave: 
-        append = True
-    else:
-        append = False
-        plot.firstSave = True
-    # write to -corrLog.csv files
-    for f,writeThis in plot.allLogs.items():
+def writeLogs(logs, append):
+    # write the lines in logs (wav file -> log lines) to the -corrLog.csv files (added to the end of the
+    # files if append, otherwise the files are written over) and the corrections database
+    for f,writeThis in logs.items():
         if not writeThis: continue
+        recording = basename(f).replace('.wav','')
+        path = join(args.o, recording+'-corrLog.csv')
+        # the database only has to be added to if it has the rest of the log file
+        current = append and correctionDB.current(recording, path)
         # write header to log file
-        header = True if not isfile(join(args.o,basename(f).replace('.wav','-corrLog.csv'))) else False
-        if args.a or append:
-            log = csv.writer(open(join(args.o,basename(f).replace('.wav','-corrLog.csv')),'a'))
-            if header: log.writerow(['annotator','id','vowel','word','oldTime','time','duration (ms)','stress','maxForms','oldF1','F1','oldF2','F2'])
-        else:
-            log = csv.writer(open(join(args.o,basename(f).replace('.wav','-corrLog.csv')),'wb'))
-            log.writerow(['annotator','id','vowel','word','oldTime','time','duration (ms)','stress','maxForms','oldF1','F1','oldF2','F2'])
-        # write info to log file 
-        for w in writeThis:
-            log.writerow([args.annotator]+[w[0].split('-')[-1]]+w[1:])
-
-# get pitch files if -f0 flag is used
-if args.f0: pitchFiles = glob(join(args.f0,'*.Pitch'))
-
-# lists of headings from the config file
-mandatoryHeadings  = ['ARPABET','STRESS', 'WORD', 'F1', 'TIME', 'WORD PRONUNCIATION', 'MAX FORMANTS', 'BEGINNING', 'END', 'INDEX']
-durHeadings = ['F1@20%', 'F2@20%' ,'F1@35%' , 'F2@35%' , 'F1@50%' , 'F2@50%' , 'F1@65%' , 'F2@65%' , 'F1@80%' , 'F2@80%']
-optionalHeadings = ['DURATION', 'PRECEDING PHONE', 'FOLLOWING PHONE', 'CELEX', 'ALT MEASUREMENTS']
+        header = not append or not isfile(path)
+        with open(path, 'ab' if append else 'wb') as logF:
+            log = csv.writer(logF)
+            if header: log.writerow(correctionStore.header)
+            # write info to log file
+            for w in writeThis:
+                log.writerow([args.annotator]+[w[0].split('-')[-1]]+w[1:])
+        if current: correctionDB.add(recording, args.annotator, writeThis, path)
+        else: correctionDB.importCsv(recording, path)
+
+# get pitch files (by recording id) if -f0 flag is used
+if args.f0: pitchFiles = manifest.scan(args.f0)['pitch']
 
 def readConfig():
     # read from the config file to get the formant.txt file headings
@@ -158,130 +179,154 @@ def readConfig():
     configDict = {c[0].strip(): c[1].strip() for c in configList}
     return configDict
 
+def keywordFiles(files, pattern):
+    # files (recording id -> path) whose names match a keyword pattern
+    return {r: f for r,f in files.items() if fnmatch(basename(f), pattern)}
+
 def getFiles(sett):
-    # get all relevant files and pair them together
-    # as (wav file, formant.txt file)
+    # get all relevant files and pair them together by
+    # recording id as (wav file, formant.txt file)
     sett.files = []
     # if looking in directories
     if isdir(args.wav) and isdir(args.vowels):
-        wFiles = glob(join(args.wav,'*'+args.k+'*.wav'))
-        vFiles = glob(join(args.vowels,'*'+args.k+'*'))
-        vFiles = [v for v in vFiles if '.plt' in v or 'formant.txt' in v]
-        for w in wFiles:
-            for v in vFiles:
-                if basename(w.replace('.wav','')) in basename(v):
-                    sett.files += [(w,v)]
+        wFiles = keywordFiles(manifest.scan(args.wav)['wav'], '*'+args.k+'*.wav')
+        vFiles = keywordFiles(manifest.scan(args.vowels)['formant'], '*'+args.k+'*')
+        sett.files = [(wFiles[r],vFiles[r]) for r in sorted(wFiles) if r in vFiles]
     # if only one formant file given
     elif isdir(args.wav):
-        wFiles = glob(join(args.wav,'*'+args.k+'*.wav'))
-        for w in wFiles:
-            if basename(w.replace('.wav','')) in basename(args.vowels):
-                sett.files += [(w,args.vowels)]
+        wFiles = keywordFiles(manifest.scan(args.wav)['wav'], '*'+args.k+'*.wav')
+        r = corpusManifest.recordingId(args.vowels)[1]
+        if r in wFiles:
+            sett.files += [(wFiles[r],args.vowels)]
     # if only one wav file given
     elif isdir(args.vowels):
-        vFiles = glob(join(args.vowels,'*'+args.k+'*'))
-        for v in vFiles:
-            if basename(args.wav.replace('.wav','')) in basename(v):
-                sett.files += [(args.wav,v)]
+        vFiles = keywordFiles(manifest.scan(args.vowels)['formant'], '*'+args.k+'*')
+        r = corpusManifest.recordingId(args.wav)[1]
+        if r in vFiles:
+            sett.files += [(args.wav,vFiles[r])]
     # if only one formant file and only one wav file is given
     else:
         sett.files += [(args.wav,args.vowels)]
+    manifest.save()
     sett.files = [f for f in sett.files if 'txt' == f[1][-3:]]
     assert sett.files, 'ERROR: no files found'
 
-def calculateVowelLocation(f, plot):
-    # calculates the location to display the vowel based on tuple of (F1,F2)    
+def plotTransform(plot):
+    # values needed to calculate vowel locations for the current zoom and window size
     wOffsetBig, wOffsetSmall = relativeSizing([20,15])
     hOffsetBig, hOffsetSmall = relativeSizing([20,15], 'h')
-    x = (((plot.maxMin[3]-float(f[1])))/(plot.maxMin[3]-plot.maxMin[1]))*(plot.width - wOffsetBig)+wOffsetSmall 
-    y = ((float(f[0]) - plot.maxMin[0])/(plot.maxMin[2]-plot.maxMin[0]))*(plot.height - hOffsetBig)+hOffsetSmall
+    return (plot.maxMin, plot.width - wOffsetBig, wOffsetSmall, plot.height - hOffsetBig, hOffsetSmall)
+
+def vowelLocations(F1, F2, transform):
+    # calculates the location to display vowels with formants F1 and F2 
+    # (numbers or numpy arrays), transform is the output of plotTransform
+    maxMin, width, wOffsetSmall, height, hOffsetSmall = transform
+    x = ((maxMin[3]-F2)/(maxMin[3]-maxMin[1]))*width+wOffsetSmall 
+    y = ((F1 - maxMin[0])/(maxMin[2]-maxMin[0]))*height+hOffsetSmall
     return (x,y)
 
-def makeVowelButton(v, plot, settings = {'w':8, 'h':8, 'bgcol':'new', 'fgcol':'new'}):
-    # makes a new vowel button for each new vowel
-    x,y = calculateVowelLocation((v.F1,v.F2), plot)
-    buttonRect = pygame.Rect(x,y, settings['w'], settings['h'])
-    buttonRect.center = (x,y)
-    button = pygbutton.PygButton(buttonRect,'►'.decode('utf8'),border = False)
-    button.bgcolor = colours[v.name] if settings['bgcol'] == 'new' else settings['bgcol']
-    button.fgcolor = colours[v.name] if settings['fgcol'] == 'new' else settings['fgcol']
+def calculateVowelLocation(f, plot):
+    # calculates the location to display the vowel based on tuple of (F1,F2)    
+    return vowelLocations(float(f[0]), float(f[1]), plotTransform(plot))
+
+def placeVowels(plot):
+    # move all vowels in plot.layout to their location for the current zoom and window size
+    plot.layout.setTransform(plotTransform(plot))
+
+def makeVowelButton(v, plot):
+    # makes a new vowel button (a token mark drawn by tokenLayer) for each new vowel
+    # it is drawn at the location of the vowel's row in plot.layout
+    button = tokenLayer.TokenMark(None, vowelCaption, colours[v.name], colours[v.name])
+    button.place(plot.layout, v.index)
     return button
 
-def getCelexVowel(word,cmu,vIndex):
+def commitVowel(v, plot):
+    # write a remeasured vowel to the token store (see vowelView.commit) and
+    # draw its button at the location of the new row
+    newV = v.commit()
+    newV.button.place(plot.layout, newV.index, newV.button.tokenSize())
+    return newV
+
+def getCelexVowel(cmu,vIndex,mapping):
     # gets celex vowel for each vowel token according to the 
-    # word it occurs in (not a one to one mapping)
+    # celex mapping of the word it occurs in (not a one to one mapping)
     allIndexes = [i for i,c in enumerate(cmu) if c[:-1] in arpVowels]
     vIndex = allIndexes.index(vIndex)
     try:
-        return saveDict[(word,''.join(cmu))][vIndex][1][0]
+        return mapping[vIndex][1][0]
+    except:
+        return ''
+
+def mapWord(pair):
+    # returns (pair, celex mapping) for a (word, pronunciation) pair
+    # (mapping is None if the word can't be mapped)
+    word, pron = pair
+    try:
+        return pair, mapToCelex.mapToCelex(word, pron.split(' '))
     except:
+        return pair, None
+
+def celexMappings(pairs, pool = None):
+    # returns a dict of (word, pronunciation) -> celex mapping for all pairs
+    # pairs that haven't been saved before are mapped (in parallel if a
+    # process pool is given) and added to the save file
+    mappings = {}
+    toMap = []
+    for word, pron in pairs:
         try:
-            return mapToCelex.mapToCelex(word,cmu, makeSave = True)[vIndex][1][0]
-        except:
-            return ''
-# place to write last file and frame checked
-# when iterating over the pitch files
-oldPitchFile = None
-oldPitchFrame = 0
-
-def getPitch(pitchList, timestamp, thisPitch):
-    # find pitch at time for a vowel token
-    global oldPitchFile, oldPitchFrame
-    dx = None
-    x1 = None
-    ceiling  = None
-    for p in pitchList:
-        pvar = p.split('=')
-        if 'dx' in pvar[0]: dx = float(pvar[1].strip())
-        if 'x1' in pvar[0]: x1 = float(pvar[1].strip())
-        if 'ceiling' in pvar[0]: 
-            ceiling = float(pvar[1].strip())
-            break
-    frame = '['+str(int(((float(timestamp)-x1)/dx)))+']'
-    foundFrame = False
-    pitch = 'Not Found'
-    if oldPitchFile != thisPitch:
-        oldPitchFrame = 0
-    startHere = oldPitchFrame 
-    for i,p in enumerate(pitchList[startHere:]):
-        if 'frame' in p and frame in p: foundFrame = True
-        if foundFrame and 'candidate [1]' in p:
-            pitchNum = float(pitchList[i+startHere+1].split('=')[1].strip())
-            if pitchNum != 0 and pitchNum < ceiling:
-                pitch = str(int(pitchNum))
-            oldPitchFile = thisPitch
-            oldPitchFrame = i+oldPitchFrame
-            return pitch
-                 
-
-def assignMaxMin(plot, allvowels):
+            mappings[(word, pron)] = mapToCelex.getSaved(word, pron.replace(' ',''))
+        except KeyError:
+            toMap += [(word, pron)]
+    if pool and len(toMap) > 1:
+        mapped = pool.imap_unordered(mapWord, toMap, 32)
+    else:
+        mapped = map(mapWord, toMap)
+    for (word, pron), mapping in mapped:
+        mappings[(word, pron)] = mapping
+        if mapping is not None:
+            mapToCelex.addSaved({(word.upper(), pron.replace(' ','')): mapping})
+    return mappings
+
+def fillAltVowels(tables, pool = None):
+    # gets the celex vowel (or unreduced vowel in arpabet mode) of the tokens in
+    # each table if not already in the formant.txt file (celex mode only). Every
+    # unique (word, pronunciation, vowel index) is only looked up once for all the tables
+    todo = []
+    for t in tables:
+        if args.c and 'altVow' in t: continue # celex vowels from the CELEX column
+        if not len(t['word']): # no vowels in the file
+            t['altVow'], t['altVowVocab'] = tokenStore.encode([])
+            continue
+        rows = np.column_stack([t['word'], t['pron'], t['index']]).astype(np.int64)
+        keys, inverse = np.unique(rows, axis = 0, return_inverse = True)
+        keys = [(t['wordVocab'][w], t['pronVocab'][p], int(i)) for w,p,i in keys.tolist()]
+        todo += [(t, keys, inverse.reshape(-1))]
+    if args.c:
+        mappings = celexMappings(set([(w,p) for t,keys,inverse in todo for w,p,i in keys]), pool)
+    altVows = {}
+    for t, keys, inverse in todo:
+        for k in keys:
+            if k in altVows: continue
+            word, pron, vIndex = k
+            if args.c:
+                altVows[k] = getCelexVowel(pron.split(' '), vIndex, mappings[(word, pron)])
+            else:
+                altVows[k] = getCmuPron(word, vIndex, pron.split(' '), altDict)
+        codes, t['altVowVocab'] = tokenStore.encode([altVows[k] for k in keys])
+        t['altVow'] = codes[inverse]
+    if args.c:
+        for t in tables:
+            t['altVowVocab'] = np.array([a if a.strip() != '' else 'NA' for a in t['altVowVocab']], dtype = object)
+
+def assignMaxMin(plot, store):
     # get maxMin value for plot
-    plot.maxF1 = max([float(a.F1) for a in allvowels])
-    plot.minF1 = min([float(a.F1) for a in allvowels])
-    plot.maxF2 = max([float(a.F2) for a in allvowels])
-    plot.minF2 = min([float(a.F2) for a in allvowels])
+    plot.maxF1 = float(store['F1'].max())
+    plot.minF1 = float(store['F1'].min())
+    plot.maxF2 = float(store['F2'].max())
+    plot.minF2 = float(store['F2'].min())
     plot.maxMin = (plot.minF1, plot.minF2, plot.maxF1, plot.maxF2)
     plot.defaultMaxMin = (plot.minF1, plot.minF2, plot.maxF1, plot.maxF2)
 
-def primaryCmuPronDict():
-    # make a dictionary with the primary pronunciation for all
-    # words in cmu.txt. Primary pronunciation is the pron with the
-    # most segments and the least schwa (AH0) vowels
-    cmuF = open(os.path.join('support_scripts','cmu.txt'))
-    lines = cmuF.readlines()
-    cmuF.close()
-    cmuDict = {}
-    for l in lines:
-        word = l.split(' ',1)[0].strip()
-        pron = l.split(' ',1)[1].strip().split()
-        if word not in cmuDict:
-            cmuDict[word] = pron
-        elif len(pron) > len(cmuDict[word]):
-            cmuDict[word] = pron
-        elif len(pron) == len(cmuDict[word]) and len([p for p in pron if p in ['AH0', 'IH0']]) < len([p for p in cmuDict[word] if p in ['AH0', 'IH0']]):
-            cmuDict[word] = pron
-    return cmuDict
-
 def getCmuPron(word, ind, pron, cmuDict):
     # returns unreduced vowel (when possible)
     try:
@@ -298,140 +343,140 @@ def getCmuPron(word, ind, pron, cmuDict):
             return unreducedPron[i][:2]
     return 'NA' 
 
-def getVowels(plot, sett):
-    # reads all the vowels from the formant.txt file
-    allvowels = []
+# cmu lookup table of primary pronunciations (set in getVowels, ARPABET mode only)
+altDict = None
+
+def loadFile(f):
+    # reads the vowels from a (wav file, formant.txt file) pair
+    # returns (table of vowels, corrections from the log file)
+    # or None if the mandatory headings are not found
     headings = readConfig()
-    revHeadings = {v:k for k,v in headings.items()}
-    if not args.c:
-        altDict = primaryCmuPronDict()
-    for f in sett.files:
-        # display which file is being processed TODO: speed this up
-        loadingMessage(plot.display, myfont, ['Loading Vowels', basename(f[0]).replace('.wav','')])
-        # get pitch track if f0 is specified as an argument (from the command line)
-        if args.f0: 
-            thisPitch = [p for p in pitchFiles if basename(p).replace('.Pitch','') in basename(f[0])][0]
-            pitchList = [p.replace('\n','').strip() for p in open(thisPitch,'rU').readlines()]
-        vowelF = open(f[1],'r')
-        vowels = vowelF.readlines()
-        
-        # find header line and column indexes
-        indexes = {i: None for i in mandatoryHeadings+durHeadings+optionalHeadings}
-        badFile = True
-        for i,line in enumerate(vowels):
-            headCount = 0
-            for head in mandatoryHeadings:
-                if headings[head] in line: headCount += 1
-            if headCount == len(mandatoryHeadings):
-                for j,l in enumerate(line.split('\t')):
-                    try: indexes[revHeadings[l]] = j  
-                    except: pass
-                badFile = False
-                vowels = vowels[i+1:]
-                break
-        if badFile:
+    # get pitch track if f0 is specified as an argument (from the command line)
+    if args.f0: 
+        thisPitch = pitchFiles.get(corpusManifest.recordingId(f[0])[1])
+        track = pitchTrack.readCachedPitchFile(thisPitch, cacheDir) if thisPitch else None
+    table = tokenStore.readCachedFormantFile(f[1], headings, cacheDir)
+    if table is None:
+        return None
+
+    #get the corrections saved for the recording (from the corrections database if it has
+    #the log file as it is now, otherwise from the log file itself)
+    logR = None
+    logFile = join(args.o, basename(f[0]).replace('.wav','')+'-corrLog.csv')
+    if isfile(logFile):
+        recording = basename(f[0]).replace('.wav','')
+        try:
+            if correctionDB.current(recording, logFile):
+                logR = correctionDB.rows(recording, latest = True)
+            else:
+                logR = correctionStore.readCsv(logFile)
+        except (IOError, csv.Error):
+            print >> sys.stderr, 'WARNING: could not read the log file '+logFile
+
+    if args.f0 and track is not None:
+        table['pitch'] = pitchTrack.pitchAt(track, table['time'])
+    corrections = {}
+    if logR:
+        # index the log by vowel id (later lines overwrite earlier ones)
+        logIndex = {line[1].strip(): line for line in logR if len(line) > 1}
+        for i in range(len(table['F1'])):
+            line = logIndex.get(str(i+1))
+            if not line: continue
+            try:
+                if not line[13].strip():
+                    corrections[i] = (line[5], line[8], line[10], line[12])
+                else:
+                    corrections[i] = 'removed'
+            except: 
+                corrections[i] = (line[5], line[8], line[10], line[12])
+    return table, corrections
+
+def loadFileAt(position):
+    # loadFile for use with a process pool: takes (index in files, ...) and
+    # returns (index in files, ..., (start time, seconds, process id) of reading the file)
+    i, f = position
+    start = time.time()
+    result = loadFile(f)
+    return i, result, (start, time.time() - start, os.getpid())
+
+def getVowels(plot, sett, files = None):
+    # reads all the vowels from the formant.txt files (all files in sett.files
+    # unless files is given) into a token store
+    global altDict
+    if files is None: files = sett.files
+    if not args.c and altDict is None:
+        altDict = cmuLookup.CmuLookup(join('support_scripts','cmu.txt'), cacheDir)
+    store = tokenStore.TokenStore()
+    store.hasPitch = bool(args.f0)
+    loaded = [None]*len(files)
+    pool = None
+    if args.j == 1 or len(files) == 1:
+        for i,f in enumerate(files):
+            # display which file is being processed
+            loadingMessage(plot.display, myfont, ['Loading Vowels', basename(f[0]).replace('.wav','')])
+            with trace.timed('loadFile', file = basename(f[0])):
+                loaded[i] = loadFile(f)
+    else:
+        # read files in parallel (each file is read in a separate process)
+        loadingMessage(plot.display, myfont, ['Loading Vowels', '0 of %d files' % len(files)])
+        pool = multiprocessing.Pool(args.j if args.j > 0 else None)
+        for done,(i,result,timing) in enumerate(pool.imap_unordered(loadFileAt, enumerate(files))):
+            loaded[i] = result
+            trace.add('loadFile', timing[0], timing[1], thread = timing[2], file = basename(files[i][0]))
+            loadingMessage(plot.display, myfont, ['Loading Vowels', '%d of %d files' % (done+1, len(files)), basename(files[i][0]).replace('.wav','')])
+            pygame.event.pump()
+    # get celex (or unreduced) vowels for all files at once
+    loadingMessage(plot.display, myfont, ['Loading Vowels', 'celex vowels' if args.c else 'unreduced vowels'])
+    with trace.timed('fillAltVowels'):
+        fillAltVowels([result[0] for result in loaded if result is not None], pool)
+    if pool:
+        pool.close()
+        pool.join()
+    for f,result in zip(files, loaded):
+        if result is None:
             loadingMessage(plot.display, myfont, ['Mandatory Headings not found','for file: ', basename(f[0]).replace('.wav',''), 'check config.txt file'])
             print >> sys.stderr, 'Mandatory Headings not found','for file: '+ basename(f[0]).replace('.wav','')
             pygame.time.wait(2000)
             continue
-
-        #get associated log file if available
-        try:
-            logF = open(join(args.o , basename(f[0]).replace('.wav','')+'-corrLog.csv'),'rU')
-            logR = list(csv.reader(logF))[1:]
-            logF.close()
-        except: 
-            logR = None    
-
-        for i,v in enumerate(vowels):
-            v = v.split('\t')
-            nV = plotmishClasses.vowel(float(v[indexes['F1']]),float(v[indexes['F2']]),f[0]) # initialize new vowel
-            # get other formant measurements from various points in the vowel duration  
-            # (F1@20%, F2@20%, F1@35%, F2@35%, F1@50%, F2@50%, F1@65%, F2@65%, F1@80%, F2@80%)
-            nV.id = basename(f[0]).replace('.wav','')+'-'+str(i+1)
-            extraForms = [v[indexes[h]] for h in durHeadings]
-            if len(extraForms) == len(durHeadings):  
-                for j in range(0,len(extraForms),2):
-                    try: nV.durForms += [(round(float(extraForms[j]),1),round(float(extraForms[j+1]),1))]
-                    except: continue
-            # allow this vowel to be remeasured using % duration if all formant measurements are accounted for 
-            if len(nV.durForms) == 5: nV.remeasureOpts += ['dur']
-            # get other formant measurements from the same point with various max Formant settings (3,4,5,6)
-            if indexes['ALT MEASUREMENTS'] != None:
-                moreForms = [re.sub('[\[\]]','',m).split(',') for m in v[indexes['ALT MEASUREMENTS']].split('],[')]
-                for m in moreForms:
-                    try:
-                        temp = [tuple([round(float(n.strip()),1) for n in m[:2]])]
-                    except: 
-                        assert False, 'ERROR:\tthe formant.txt files do not contain extra formant measurement info\n\t\t\tmake sure the config.txt file in FAVE-extract has the line:\n\t\t\tcandidates=T\n\t\t\tand then re-extract the formant values'
-                    if len(temp[0]) != 2:
-                        continue
-                    nV.numForms += temp
-            # allow this vowel to be remeasured using max Formants if all formant measurements are accounted for 
-            if len(nV.numForms) == 4: nV.remeasureOpts += ['num']
-            # get other values 
-            cmuPron = [p.strip() for p in re.sub('[\[\]\']','',v[indexes['WORD PRONUNCIATION']]).split(',')]
-            nV.pPhone = v[indexes['PRECEDING PHONE']] if indexes['PRECEDING PHONE'] != None else '??'
-            nV.fPhone = v[indexes['FOLLOWING PHONE']] if indexes['FOLLOWING PHONE'] != None else '??'
-            nV.word = v[indexes['WORD']]
-            nV.name = v[indexes['ARPABET']]
-            vIndex = int(v[indexes['INDEX']])
-            if args.c:
-                nV.altVow = getCelexVowel(nV.word,cmuPron,vIndex) if indexes['CELEX'] == None else v[indexes['CELEX']]
-                if nV.altVow.strip() == '': nV.altVow = 'NA'
-            else:
-                nV.altVow = getCmuPron(nV.word, vIndex, cmuPron, altDict)
-            nV.time = v[indexes['TIME']]
-            if args.f0: nV.pitch = getPitch(pitchList, nV.time, thisPitch) 
-            nV.maxForm = v[indexes['MAX FORMANTS']]
-            nV.stress = v[indexes['STRESS']]
-            nV.timeRange = (v[indexes['BEGINNING']],v[indexes['END']])
-            nV.duration = str(int(float(v[indexes['DURATION']])*1000)) if indexes['DURATION'] != None else '??'
-            nV.wFile = f[0]
-            if logR:
-                for line in logR:
-                    if line[1].strip() == str(i+1):
-                        try:
-                            if not line[13].strip():
-                                nV.alreadyCorrected = (line[5], line[8], line[10], line[12])
-                            else:
-                                nV.alreadyCorrected = 'removed'
-                        except: 
-                            nV.alreadyCorrected = (line[5], line[8], line[10], line[12])
-            allvowels += [nV]
+        table, corrections = result
+        rows = store.extend(f[0], table)
+        for i,c in corrections.items():
+            store.corrections[rows.start+i] = c
     
-    # save all translated words for future easy access
-    mapToCelex.writeSaved(celStore) 
-    assignMaxMin(plot, allvowels)
+    # save newly translated words for future easy access
+    mapToCelex.writeSaved()
+    plot.store = store
+    assignMaxMin(plot, store)
+    plot.layout = tokenLayer.Layout(store, vowelLocations, (8,8))
+    placeVowels(plot)
+    allvowels = [plotmishClasses.vowelView(store, i) for i in range(len(store))]
     for av in allvowels:
         av.button = makeVowelButton(av, plot)
     
     return allvowels
 
 
-def confidenceEllipse(xyPoints,sdev,plot):
-    # make a confidence ellipse of the points currently plotted on the scree
-    # adapted from Jaime at: 
-    #stackoverflow.com/questions/20126061/creating-a-confidence-ellipses-in-a-sccatterplot-using-matplotlib
-    x = [calculateVowelLocation(xy, plot)[0] for xy in xyPoints]
-    y = [calculateVowelLocation(xy, plot)[1] for xy in xyPoints]
-    angleAdjust = False if np.mean([p[1] for p in sorted(xyPoints)[:int(len(xyPoints)/2.0)]]) < np.mean([p[1] for p in sorted(xyPoints)[int(len(xyPoints)/2.0):]]) else True
-    mean = (np.mean(x),np.mean(y))
-    cov = np.cov(x, y)
-    lambda_, v = np.linalg.eig(cov)
-    lambda_ = np.sqrt(lambda_)
-    angle = np.rad2deg(np.arccos(v[0, 0]))
-    if angleAdjust: angle = 180-angle
-    width=lambda_[0]*sdev*2
-    height=lambda_[1]*sdev*2
-    plot.display.fill(WHITE)
-    ellipDim = pygame.Rect(0,0,width,height)
-    ellipDim.center = (WINDOWWIDTH/2.0,WINDOWHEIGHT/2.0)
-    pygame.draw.ellipse(plot.display,BLACK,ellipDim,2)
-    rot_img = pygame.transform.rotate(plot.display, angle)
-    img_rect = rot_img.get_rect()
-    img_rect.center = mean
-    plot.ellip = (rot_img, img_rect)
+def updateEllipses(sett, plot):
+    # set plot.ellip to the (colour, outline) of the confidence ellipses of the vowels displayed
+    # (one black ellipse for all of them or one for each vowel class in the colour of the class)
+    plot.ellip = []
+    if not sett.stdDevCounter: return
+    rows = np.fromiter((v.index for v in sett.vowList), dtype = np.int64, count = len(sett.vowList))
+    groups = ellipses.groupRows(plot.store, rows, sett.classEllipses)
+    transform = plotTransform(plot)
+    for name,(mean,cov) in sorted(sett.ellipses.stats(plot.store, groups).items()):
+        F1, F2 = ellipses.outline(mean, cov, sett.stdDevCounter)
+        x, y = vowelLocations(F1, F2, transform)
+        plot.ellip.append((colours[name] if name else BLACK, zip(x.tolist(), y.tolist())))
+
+def updateDensity(sett, plot):
+    # set plot.density to a density map of the vowels displayed if there are more than
+    # args.d of them (they are too many to draw one by one), otherwise to None
+    plot.density = None
+    if not args.d or len(sett.vowList) <= args.d: return
+    rows = np.fromiter((v.index for v in sett.vowList), dtype = np.int64, count = len(sett.vowList))
+    cell = max(1, plot.layout.size[0]//2) # half the size of a vowel token
+    plot.density = sett.density.image(plot.layout, rows, (plot.width, plot.height), cell, colours)
 
 def relativeSizing(valList, orientation = 'w'):
     #returns relative size for button location and sizes
@@ -570,14 +615,15 @@ def makeButtons(oldButtons = {}):
 
 def loadingMessage(surface, font, message):
     # display loading message
+    if not pygame.display.get_surface(): return # no window (when exporting)
     surface.fill(WHITE)
     for i,m in enumerate(message):
         mess = font.render(m,1,BLACK)
         surface.blit(mess,(WINDOWWIDTH/2.0-(font.size(m)[0]/2.0),WINDOWHEIGHT/2.0-(font.size(m)[1]/2.0)+(i*(font.size(m)[1])+5)))
     pygame.display.update()
 
-def drawGrid(numFont, plot):
-    # draw grid and max/min over plot area
+def drawGrid(numFont, plot, surface):
+    # draw grid and max/min over plot area (on surface)
     # horizontal lines are every 100 Hz
     # vertical lines are every 50 Hz 
     # initialize start and end points and the distance between lines
@@ -592,21 +638,21 @@ def drawGrid(numFont, plot):
     while True:
         hlimit = startH + h*intervalH
         if hlimit > plot.height: break
-        pygame.draw.line(plot.display,Color('grey87') ,(hzSpace,hlimit),(plot.width,hlimit)) 
+        pygame.draw.line(surface,Color('grey87') ,(hzSpace,hlimit),(plot.width,hlimit)) 
         h += 1
     # draw vertical lines
     while True:
         vlimit = startV - v*intervalV
         if vlimit < vtSpace: break
-        pygame.draw.line(plot.display,Color('grey87'),(vlimit,plot.height),(vlimit, vtSpace))
+        pygame.draw.line(surface,Color('grey87'),(vlimit,plot.height),(vlimit, vtSpace))
         v += 1
     # write max and min values for F1 and F2 
     fontMaxMin = [numFont.render(str(int(i)),1,BLACK) for i in plot.maxMin]
-    plot.display.blit(fontMaxMin[0],(plot.width-numFont.size(str(int(plot.minF1)))[0],numFont.size(str(int(plot.minF1)))[1]+vtSpace))
-    plot.display.blit(fontMaxMin[1],(plot.width-numFont.size(str(int(plot.minF2)))[0]-hzSpace,vtSpace))
-    plot.display.blit(fontMaxMin[2],(plot.width-numFont.size(str(int(plot.maxF1)))[0], plot.height-numFont.size(str(int(plot.minF1)))[1]))
+    surface.blit(fontMaxMin[0],(plot.width-numFont.size(str(int(plot.minF1)))[0],numFont.size(str(int(plot.minF1)))[1]+vtSpace))
+    surface.blit(fontMaxMin[1],(plot.width-numFont.size(str(int(plot.minF2)))[0]-hzSpace,vtSpace))
+    surface.blit(fontMaxMin[2],(plot.width-numFont.size(str(int(plot.maxF1)))[0], plot.height-numFont.size(str(int(plot.minF1)))[1]))
     hzSpace = relativeSizing(12)
-    plot.display.blit(fontMaxMin[3],(hzSpace, vtSpace))
+    surface.blit(fontMaxMin[3],(hzSpace, vtSpace))
 
 
 def resize(tempMaxMin, plot):
@@ -623,41 +669,38 @@ def resize(tempMaxMin, plot):
         plot.maxMin = plot.defaultMaxMin
         plot.minF1, plot.minF2, plot.maxF1, plot.maxF2 = plot.defaultMaxMin
     # set the vowel buttons to their new location
-    for v in plot.vowButtons:
-        x,y = calculateVowelLocation((v.F1,v.F2),plot)
-        v.button.rect.center = (x,y)
-    # set the current vowel to it's new location
-    if plot.currentVowel:
-        x,y = calculateVowelLocation((plot.currentVowel.F1, plot.currentVowel.F2), plot)
-        plot.currentVowel.button.rect.center = (x,y)
+    placeVowels(plot)
 
-def clearRange(tempMaxMin, reason, plot, within = None):
+def clearRange(tempMaxMin, reason, plot, sett, within = None):
     # clear a range of vowels that fall in tempMaxMin
     # with a reason for their removal
     # only remove vowels in the within list (this is used to only remove vowels currently
     #  displayed on the screen, not all vowels in the range)
     if not within: within = plot.vowButtons # remove all vowels in range if within not set
     # clear the vowel if it's in the range
-    tempVBL = []
-    for v in plot.vowButtons:
-        x,y = v.button.rect.center
-        if not (y > tempMaxMin[0] and x < tempMaxMin[1] and y < tempMaxMin[2] and x > tempMaxMin[3]) or v not in within:
-            tempVBL += [v]
-        else:
-            clear(v, reason, plot)
+    rects = tokenLayer.markRects([v.button for v in plot.vowButtons])
+    x, y = rects[:,0] + rects[:,2]//2, rects[:,1] + rects[:,3]//2 # centres of the vowel buttons
+    inRange = (y > tempMaxMin[0]) & (x < tempMaxMin[1]) & (y < tempMaxMin[2]) & (x > tempMaxMin[3])
+    within = set(map(id, within))
+    removed = [v for v,r in zip(plot.vowButtons, inRange) if r and id(v) in within]
+    changeVowels(sett, plot, removed, lines = [clear(v, reason, plot) for v in removed])
     # remove current vowel if it falls in the range
     if plot.currentVowel:
         x,y = plot.currentVowel.button.rect.center
         plot.currentVowel = plot.currentVowel if not (y > tempMaxMin[0] and x < tempMaxMin[1] and y < tempMaxMin[2] and x > tempMaxMin[3]) else None 
     if not plot.currentVowel: plot.textList = [] # if the current vowel is removed, stop displaying it's info
-    plot.vowButtons = tempVBL
 
 def clear(vowel, reason, plot):
-    # write to log that a vowel has been removed with a given reason
+    # returns the (wav file, log line) to write to the log when a vowel has been removed with a given reason
     because = 'unallowed variant' if not plot.remReason and not reason else plot.remReason+' '+reason
     because = 'removed: '+because if not plot.remReason else because
     newInfo = [str(wr) for wr in [vowel.id, vowel.name ,vowel.word,'NA',vowel.time,vowel.duration,vowel.stress,vowel.maxForm,'NA','NA','NA','NA',because]]
-    plot.allLogs[vowel.wFile] += [newInfo]
+    return vowel.wFile, newInfo
+
+def changeVowels(sett, plot, removed = (), added = (), lines = ()):
+    # remove the vowels in removed from the plot, add the vowels in added and write the
+    # log lines in lines ((wav file, line) pairs), the change can be undone (see undoJournal)
+    plot.vowButtons = sett.journal.change(plot.vowButtons, plot.allLogs, removed, added, lines)
 
 
 def updateDisplayed(displayed, button, plot):
@@ -688,9 +731,18 @@ def writeInfo(v, plot):
     if args.f0: plot.textList += ['pitch: '+ v.pitch]
 
 def initializeSettings(sett, plot):
+    # write the changes that weren't saved when plotmish last crashed to the log files (so they
+    # can be resumed) and start journaling the changes made in this session (see correctionJournal)
+    sett.corrections = correctionJournal.CorrectionJournal(args.o, args.annotator)
+    recovered = [r for r in sett.corrections.recover() if any(r[0].values())]
+    for logs, append in recovered:
+        writeLogs(logs, append)
+    if recovered:
+        plot.firstSave = True # add to the recovered changes instead of writing over them
+        print >> sys.stderr, 'Recovered %d unsaved changes (click Resume to display them)' % sum([len(l) for logs,append in recovered for l in logs.values()])
+    sett.corrections.begin(args.a or plot.firstSave)
     # set memory lists
-    sett.displayMemory = [plot.vowButtons] # list of all vowel plots up to the last save
-    sett.logMemory = [plot.allLogs] # list of all log dicts up to the last save
+    sett.journal = undoJournal.UndoJournal(record = sett.corrections) # changes that can be undone (up to the last save)
     sett.praatLog = join(os.getcwd(),'praatLog') # set path of praatlog file (location of output of praat)     
     #initialize all buttons (permanent and vowel tokens)
     sett.permButtons = makeButtons() # make permanent buttons (vowel buttons, display all/none buttons)
@@ -703,10 +755,69 @@ def initializeSettings(sett, plot):
     sett.celLabel = myfont.render('CELEX' if args.c else 'UNREDUCED',1,BLACK)   
     # make dictionary to log changes to
     plot.allLogs = {f[0]:[] for f in sett.files} 
-    plot.vowButtons = getVowels(plot, sett)
+    if args.s: # only load the first speaker for now
+        sett.speakers = [plotmishClasses.Speaker(f) for f in sett.files]
+        switchSpeaker(plot, sett, 0)
+    else:
+        plot.vowButtons = getVowels(plot, sett)
+
+def speakerBytes(speaker):
+    # approximate memory used by a loaded speaker
+    return speaker.store.nbytes() + len(speaker.vowButtons)*tokenBytes
+
+def evictSpeakers(plot, sett):
+    # unload the least recently used speakers until the loaded speakers fit
+    # in the memory budget (speakers with unsaved changes are never unloaded)
+    loaded = [s for s in sett.speakers if s.vowButtons is not None]
+    total = sum([speakerBytes(s) for s in loaded])
+    for s in sorted(loaded, key = lambda s: s.lastUsed):
+        if total <= args.m*1024*1024: break
+        if s is sett.speakers[sett.speaker] or plot.allLogs[s.files[0]]: continue
+        total -= speakerBytes(s)
+        s.vowButtons, s.store, s.layout = None, None, None
+
+def switchSpeaker(plot, sett, i):
+    # display the vowels of speaker i (in speaker mode), loading them if necessary
+    if sett.speaker is not None: # keep the current state of the speaker being displayed
+        old = sett.speakers[sett.speaker]
+        old.vowButtons, old.store, old.layout = plot.vowButtons, plot.store, plot.layout
+    sett.speaker = i % len(sett.speakers)
+    speaker = sett.speakers[sett.speaker]
+    speaker.lastUsed = time.time()
+    plot.currentVowel = None
+    if speaker.vowButtons is None:
+        plot.vowButtons = getVowels(plot, sett, [speaker.files])
+        speaker.vowButtons, speaker.store, speaker.layout, speaker.defaultMaxMin = plot.vowButtons, plot.store, plot.layout, plot.defaultMaxMin
+        if speaker.resumed: # show saved changes if the speaker was unloaded
+            resumeFromLog(sett, plot)
+    else:
+        plot.store, plot.layout, plot.vowButtons = speaker.store, speaker.layout, speaker.vowButtons
+        plot.minF1, plot.minF2, plot.maxF1, plot.maxF2 = speaker.defaultMaxMin
+        plot.defaultMaxMin = speaker.defaultMaxMin
+        resize(plot.defaultMaxMin, plot)
+    evictSpeakers(plot, sett)
+    # reset the display (undo only goes back to when this speaker was displayed)
+    sett.journal.clear()
+    plot.textList = []
+    plot.filtered = []
+    plot.minDur = None
+    plot.filtWrd = None
+    plot.ellip = []
+    sett.stdDevCounter = 0
+    for b in sett.permButtons[1]:
+        if b.caption == 'Reset Zoom': b.caption = 'Zoom'
+        if 'Std Dev' in b.caption: 
+            b.caption = 'Std Dev'
+            b.bgcolor = Color("darkolivegreen2")
+        if b.caption == 'Resume': b.bgcolor = Color('darkolivegreen4') if speaker.resumed else Color('darkolivegreen2')
+    pygame.display.set_caption('Plotmish - %s (%d of %d)' % (basename(speaker.files[0]).replace('.wav',''), sett.speaker+1, len(sett.speakers)))
+    sett.vowelChange = True
 
 def quit(sett):
     call(['rm', sett.praatLog]) # sanity check to remove praat log (if it still exists)
+    if sett.praatWatch: sett.praatWatch.stop()
+    if sett.corrections: sett.corrections.stop() # changes that weren't saved are discarded
+    trace.stop() # finish the timing trace file (if timing is on)
     pygame.quit() 
     sys.exit() 
 
@@ -734,9 +845,7 @@ def selectRange(plot, sett, pressCTRLA, event):
                             sett.zoomLines = None #stop drawing lines
                             sett.start, sett.stop = (),() # reset start and stop tuples to default
                             return 'break' # if no reason is given then don't remove the tokens
-                    sett.displayMemory += [[v for v in plot.vowButtons]] # make backup of display 
-                    sett.logMemory += [copy.deepcopy(plot.allLogs)] # make backup of log
-                    clearRange((T,R,B,L), reason, plot, within = sett.vowList) # clear all vowels currently displayed to screen in selected area
+                    clearRange((T,R,B,L), reason, plot, sett, within = sett.vowList) # clear all vowels currently displayed to screen in selected area
                     textList = []
                 else: # if zooming in 
                     resize((T,R,B,L), plot) # zoom in to to selected area
@@ -770,36 +879,23 @@ def togglePlay(sett, button):
         sett.FPS = 10 # resume regular frame rate
         button.bgcolor = Color("darkolivegreen2")
 
-def drawEllipse(sett, plot, button, resize = False):
-    if resize and sett.stdDevCounter != 0:
-        confidenceEllipse([(form.F1,form.F2) for form in sett.vowList],sett.stdDevCounter, plot)
-    elif not resize:
-        try:
-            if sett.stdDevCounter == 0:
-                confidenceEllipse([(form.F1,form.F2) for form in sett.vowList],1, plot)
-                sett.stdDevCounter = 1
-                button.caption = 'Std Dev 1'
-                button.bgcolor = Color("darkolivegreen4")
-            elif sett.stdDevCounter == 1:
-                confidenceEllipse([(form.F1,form.F2) for form in sett.vowList],2, plot)
-                sett.stdDevCounter = 2
-                button.caption = 'Std Dev 2'
-            elif sett.stdDevCounter == 2:
-                confidenceEllipse([(form.F1,form.F2) for form in sett.vowList],3, plot)
-                sett.stdDevCounter = 3
-                button.caption = 'Std Dev 3'
-            
-            else:
-                plot.ellip = []
-                button.caption = 'Std Dev'
-                button.bgcolor = Color("darkolivegreen2")
-                sett.stdDevCounter = 0
-        except:
-            plot.ellip = []
-            button.caption = 'Std Dev'
-            button.bgcolor = Color("darkolivegreen2")
-            sett.stdDevCounter = 0
-        sett.vowelChange = True
+def drawEllipse(sett, plot, button):
+    # show ellipses of 1, 2 or 3 standard deviations (the ellipses are drawn by updateEllipses)
+    # hold shift to switch between one ellipse for all vowels and one for each vowel class 
+    pressed = pygame.key.get_pressed()
+    if (pressed[shft[0]] or pressed[shft[1]]) and sett.stdDevCounter != 0:
+        sett.classEllipses = not sett.classEllipses
+    elif sett.stdDevCounter < 3:
+        if sett.stdDevCounter == 0:
+            sett.classEllipses = pressed[shft[0]] or pressed[shft[1]]
+        sett.stdDevCounter += 1
+        button.caption = 'Std Dev %d' % sett.stdDevCounter
+        button.bgcolor = Color("darkolivegreen4")
+    else:
+        button.caption = 'Std Dev'
+        button.bgcolor = Color("darkolivegreen2")
+        sett.stdDevCounter = 0
+    sett.vowelChange = True
 
 def filterVowels(sett, plot, button):
     # filters vowels by duration or by word
@@ -816,14 +912,16 @@ def filterVowels(sett, plot, button):
                 if plot.minDur != '':
                     plot.minDur = None
                 else: break
-        plot.filtered = [v for v in sett.vowList if int(v.duration) < plot.minDur]
+        durations = plot.store['dur'][[v.index for v in sett.vowList]]*1000
+        plot.filtered = [v for v,d in zip(sett.vowList, durations) if int(d) < plot.minDur] if not np.isnan(durations).any() else []
         # don't filter anything if no minimum duration is given
         if plot.filtered and not plot.minDur == '': # change button caption 
             button.caption = 'Rmv.Dur.Filt'
             button.font = smallButtonFont
     else: # filter according to the word
         plot.filtWrd = inputbox.ask(plot.display,'Remove word').strip().upper() # ask user to input word to remove
-        plot.filtered = [v for v in sett.vowList if v.word == plot.filtWrd]
+        words = plot.store.strings('word', [v.index for v in sett.vowList])
+        plot.filtered = [v for v,w in zip(sett.vowList, words) if w == plot.filtWrd]
         if plot.filtered and plot.filtWrd: 
             button.caption = 'Rmv.Wrd.Filt'
             button.font =  smallButtonFont 
@@ -839,12 +937,8 @@ def removeFiltered(sett, plot, button):
             else: yesno = None
     sett.vowelChange = True
     if yesno == 'y': # if yes, remove all the vowels in filtered
-        sett.displayMemory += [[v for v in plot.vowButtons]]
-        sett.logMemory += [copy.deepcopy(plot.allLogs)]
-        for f in plot.filtered:
-            reason = 'filtered: below minimum duration of %d ms' % plot.minDur if 'Dur' in button.caption else 'filtered: word %r' % plot.filtWrd
-            clear(f,reason, plot)
-            plot.vowButtons.remove(f) 
+        reason = 'filtered: below minimum duration of %d ms' % plot.minDur if 'Dur' in button.caption else 'filtered: word %r' % plot.filtWrd
+        changeVowels(sett, plot, plot.filtered, lines = [clear(f, reason, plot) for f in plot.filtered])
     # reset buttons and appropriate lists
     plot.filtered = []
     plot.minDur = None
@@ -854,47 +948,91 @@ def removeFiltered(sett, plot, button):
     button._update()
 
 def resumeFromLog(sett, plot):
-    sett.displayMemory += [[v for v in plot.vowButtons]]
-    sett.logMemory += [copy.deepcopy(plot.allLogs)]
+    removed, resumed = [], []
     for v in plot.vowButtons: 
-        if isinstance(v.alreadyCorrected,tuple): # change vowel if it's been changed and logged in the log file
-            x,y = calculateVowelLocation((v.alreadyCorrected[2],v.alreadyCorrected[3]), plot) 
+        corrected = plot.store.corrections.get(v.index)
+        if corrected is None: continue
+        removed.append(v)
+        if corrected == 'removed': # remove vowel if it's been removed in the log file
+            continue
+        if isinstance(corrected,tuple): # change vowel if it's been changed and logged in the log file
+            x,y = calculateVowelLocation((corrected[2],corrected[3]), plot) 
             buttonRect = pygame.Rect(x,y, 8, 8)
             buttonRect.center = (x,y)
-            button = pygbutton.PygButton(buttonRect, '►'.decode('utf8'),border = False) 
-            button.bgcolor = WHITE 
-            button.fgcolor = v.button.bgcolor
-            newV = v.makeAlternate(v.alreadyCorrected[2],v.alreadyCorrected[3],button) # make new vowel
-            newV.time, newV.maxForm = v.alreadyCorrected[:2] # update maxforms and time 
-            newV.alreadyCorrected = None 
-            plot.vowButtons.remove(v) 
-            plot.vowButtons.append(newV)
-    plot.vowButtons = [v for v in plot.vowButtons if v.alreadyCorrected != 'removed'] # remove vowel if it's been removed in the log file
+            button = tokenLayer.TokenMark(buttonRect, vowelCaption, WHITE, v.button.bgcolor)
+            newV = v.makeAlternate(corrected[2],corrected[3],button) # make new vowel
+            newV.time, newV.maxForm = corrected[:2] # update maxforms and time 
+            resumed.append(commitVowel(newV, plot))
+    changeVowels(sett, plot, removed, resumed)
+
+def drawBackground(sett, plot, surface):
+    # draw the plot background layer (everything on the plot but the vowels)
+    surface.fill(WHITE)
+    for colour,points in plot.ellip: # draw confidence ellipses
+        pygame.draw.lines(surface, colour, True, points, 2)
+    surface.blit(sett.F1,(plot.width-myfont.size('F1')[0],plot.height/2)) # draw F1 and F2 as axis labels for the plot
+    surface.blit(sett.F2,(plot.width/2,10))
+    drawGrid(numFont, plot, surface) # draw the grid on the plot
+
+def drawVowels(background, marks, surface, densityMap = None):
+    # draw the vowel token layer (the vowel tokens, or their density map, over the plot background)
+    surface.blit(background, (0,0))
+    if densityMap: surface.blit(densityMap, (0,0))
+    tokenLayer.drawTokens(surface, marks)
+
+def drawInfo(plot, count, surface, origin):
+    # draw the vowel info layer (info for the last vowel scrolled over and the number
+    # of vowels on the screen), origin is where the layer is drawn on the screen
+    # (it's drawn with white as transparent)
+    surface.fill(WHITE)
+    surface.set_colorkey(WHITE)
+    ox, oy = origin
+    tokenNum = myfont.render(str(count),1,BLACK) # render and draw the number of tokens currently on the screen 
+    surface.blit(tokenNum,(int(relativeSizing(710))-ox,int(relativeSizing(820, 'h'))-oy))
+    x = relativeSizing(500)
+    y,sp = relativeSizing([605,21], 'h')
+    for i,t in enumerate(plot.textList):
+        label = textListFont.render(t, 1, BLACK)
+        surface.blit(label, (int(x)-ox, int(y+(sp*i))-oy))
+
+def drawTrace(lines, surface):
+    # draw the lines of frame time stats in the top left corner of the plot
+    labels = [miniFont.render(l, 1, BLACK) for l in lines]
+    x, y = relativeSizing(20), relativeSizing(20, 'h')
+    box = pygame.Rect(x, y, max(l.get_width() for l in labels) + 10, sum(l.get_height() for l in labels) + 10)
+    pygame.draw.rect(surface, WHITE, box)
+    pygame.draw.rect(surface, BLACK, box, 1)
+    for l in labels:
+        surface.blit(l, (x+5, y+5))
+        y += l.get_height()
 
 def drawToScreen(sett, plot, NOTPLOTRECTS):
+    # the screen is drawn from layers (see plotLayers) that are only redrawn
+    # when the vowels, zoom, ellipse or window size have changed
+    plotRect = pygame.Rect(0, 0, plot.width, plot.height)
+    dirty = list(NOTPLOTRECTS) # parts of the screen to update
+    overlays = (sett.zoomLines, [xf.button for xf in plot.xFormButtons] if sett.chooseFormants else [], trace.summary() if trace.on else None)
     # draw the vowel plot if it has been updated
-    if sett.vowelChange:
-        plot.display.fill(WHITE)
-        if plot.ellip: # draw confidence ellipse
-            plot.display.blit(plot.ellip[0],plot.ellip[1])
-        plot.display.blit(sett.F1,(plot.width-myfont.size('F1')[0],plot.height/2)) # draw F1 and F2 as axis labels for the plot
-        plot.display.blit(sett.F2,(plot.width/2,10))
-        drawGrid(numFont, plot) # draw the grid on the plot
+    if sett.vowelChange or overlays != sett.overlays:
+        backgroundKey = (plot.maxMin, plot.ellip, sett.F1, sett.F2, numFont, myfont, WINDOWWIDTH)
+        background = sett.layers.setdefault('background', plotLayers.Layer()).get(backgroundKey, plotRect.size, lambda s: drawBackground(sett, plot, s))
+        marks = [v.button for v in sett.vowList] if not plot.density else [] # all vowel tokens on the screen (none if the density map is drawn)
+        vowels = sett.layers.setdefault('vowels', plotLayers.Layer()).get((backgroundKey, marks, plot.density), plotRect.size, lambda s: drawVowels(background, marks, s, plot.density))
+        plot.display.blit(vowels, plotRect)
         if sett.zoomLines: pygame.draw.lines(plot.display,BLACK,True,sett.zoomLines,1) # draw the box to zoom to/remove vowels from 
-        for b in [v.button for v in sett.vowList]: # draw all vowel tokens to the screen
-            b.draw(plot.display) 
+        if overlays[2]: drawTrace(overlays[2], plot.display) # draw the frame time stats (when timing is on)
+        dirty.append(plotRect)
+        sett.overlays = overlays
         sett.vowelChange = False
-    else:  # if it hasn't been updated, update the rest of the screen only
-        for r in NOTPLOTRECTS:
-            pygame.draw.rect(plot.display,WHITE,r)
+    # update the rest of the screen
+    for r in NOTPLOTRECTS:
+        pygame.draw.rect(plot.display,WHITE,r)
 
     lSide, bSide = [ relativeSizing(490), relativeSizing(840, 'h') ] # relative left and bottom edge of vowel info rectangle
     pygame.draw.lines(plot.display,BLACK,True, [(lSide,plot.height),(plot.width,plot.height),(plot.width,bSide),(lSide,bSide)],2) # draw rectangle to display vowel info
     
     lSide, tSide = [ relativeSizing(10), relativeSizing(10, 'h') ] # relative left and top edge of vowel button rectangle
     pygame.draw.lines(plot.display,BLACK,True, [(lSide,tSide),(plot.width,tSide),(plot.width,plot.height),(lSide,plot.height)],2) # draw rectangle to display vowel buttons
-    tokenNum = myfont.render(str(len(sett.vowList)),1,BLACK) # render and draw the number of tokens currently on the screen 
-    plot.display.blit(tokenNum,(relativeSizing(710),relativeSizing(820, 'h')))
 
     rSide, tSide = [relativeSizing(185), relativeSizing(630, 'h')]
     pygame.draw.lines(plot.display,BLACK,True,[(lSide,tSide),(rSide,tSide),(rSide,bSide),(lSide,bSide)],2) # draw the box for the arpabet vowels
@@ -918,18 +1056,17 @@ def drawToScreen(sett, plot, NOTPLOTRECTS):
     for b in sett.permDisplay: # draw all buttons
         b.draw(plot.display)
     
-    if plot.textList:    # draw info for last vowel scrolled over to screen
-        x = relativeSizing(500)
-        y,sp = relativeSizing([605,21], 'h')
-        for i,t in enumerate(plot.textList):
-            label = textListFont.render(t, 1, BLACK)
-            plot.display.blit(label, (x, y+(sp*i)))
+    # draw info for last vowel scrolled over to screen
+    x, y = relativeSizing(500), relativeSizing(605, 'h')
+    infoRect = pygame.Rect(x, y, WINDOWWIDTH - x, WINDOWHEIGHT - y)
+    infoKey = (tuple(plot.textList), len(sett.vowList), myfont, textListFont)
+    plot.display.blit(sett.layers.setdefault('info', plotLayers.Layer()).get(infoKey, infoRect.size, lambda s: drawInfo(plot, len(sett.vowList), s, infoRect.topleft)), infoRect)
     
     if sett.chooseFormants: # draw alternate formant buttons (when in choose formant mode)
-        for xf in plot.xFormButtons:
-            xf.button.draw(plot.display)
+        tokenLayer.drawTokens(plot.display, overlays[1])
+        dirty += [m.rect for m in overlays[1]]
     
-    pygame.display.update() # update screen
+    pygame.display.update(dirty) # update the parts of the screen that have changed
 
 def resizeScreen(screenSize, plot, sett):
     global WINDOWWIDTH, WINDOWHEIGHT, myfont, numFont, miniFont, textListFont, smallButtonFont, boldButtonFont
@@ -954,22 +1091,77 @@ def resizeScreen(screenSize, plot, sett):
     sett.permDisplay = sett.permButtons[0]+sett.permButtons[1]+sett.permButtons[2]
     # redraw vowel buttons in the correct spots and change size
     vowWidth, vowHeight = [ relativeSizing(8), relativeSizing(8,'h') ]
-    for v in plot.vowButtons:
-        v.button = makeVowelButton(v, plot,  settings = {'w':vowWidth, 'h':vowHeight, 'bgcol':v.button.bgcolor, 'fgcol':v.button.fgcolor})
+    plot.layout.resize((int(vowWidth), int(vowHeight)))
+    placeVowels(plot)
     # redefine text objects with new font sizes
     sett.F1,sett.F2 = (myfont.render('F1',1,Color('grey87')),myfont.render('F2',1,Color('grey87')))
     sett.arpLabel = myfont.render('ARPABET',1,BLACK)
     sett.celLabel = myfont.render('CELEX' if args.c else 'UNREDUCED',1,BLACK)
-    # draw ellipse if required
-    drawEllipse(sett, plot, None, resize = True)
     # make sure screen updates
     sett.vowelChange = True
 
+def exportPlot(files):
+    # draw the vowel plot of one speaker (wav file, formant.txt file) offscreen
+    # like drawToScreen does and write it to a png in the export folder
+    # returns (speaker name, path of the png or None if the vowels couldn't be read)
+    name = basename(files[0]).replace('.wav','')
+    loaded = loadFile(files) # (the parsed file is cached for getVowels)
+    if loaded is None or not len(loaded[0]['F1']): # mandatory headings not found or no vowels
+        return name, None
+    plot = plotmishClasses.vowelPlot(None)
+    sett = plotmishClasses.Settings()
+    plot.vowButtons = getVowels(plot, sett, [files])
+    plot.arpDisplayed = args.ev.upper().replace(' ','').split(',') if args.ev else list(arpVowels)
+    sett.visibility = visibility.Visibility()
+    sett.vowList = sett.visibility.visible(plot, 'union', [])
+    sett.stdDevCounter, sett.classEllipses = args.es, True
+    sett.ellipses = ellipses.EllipseCache()
+    updateEllipses(sett, plot)
+    sett.density = density.DensityMap()
+    updateDensity(sett, plot)
+    sett.F1,sett.F2 = (myfont.render('F1',1,Color('grey87')),myfont.render('F2',1,Color('grey87')))
+    # plot (with its border) and the speaker and number of vowels under it
+    surface = pygame.Surface((int(plot.width) + 10, int(plot.height) + 40), 0, 32)
+    background = pygame.Surface((int(plot.width), int(plot.height)), 0, 32)
+    drawBackground(sett, plot, background)
+    surface.fill(WHITE)
+    drawVowels(background, [v.button for v in sett.vowList] if not plot.density else [], surface, plot.density)
+    lSide, tSide = [ relativeSizing(10), relativeSizing(10, 'h') ]
+    pygame.draw.lines(surface,BLACK,True, [(lSide,tSide),(plot.width,tSide),(plot.width,plot.height),(lSide,plot.height)],2)
+    surface.blit(myfont.render('%s (%d vowels)' % (name, len(sett.vowList)),1,BLACK), (lSide, plot.height + 10))
+    path = join(args.e, name+'.png')
+    pygame.image.save(surface, path)
+    return name, path
+
+def exportPlots(sett):
+    # write the vowel plot of every speaker in sett.files to the export folder
+    # (each speaker is drawn in a separate process if args.j isn't 1)
+    getFiles(sett)
+    if not isdir(args.e): os.makedirs(args.e)
+    pool = None
+    if args.j != 1 and len(sett.files) > 1:
+        pool = multiprocessing.Pool(args.j if args.j > 0 else None)
+        exported = pool.imap_unordered(exportPlot, sett.files)
+    else:
+        exported = (exportPlot(f) for f in sett.files)
+    for done,(name,path) in enumerate(exported):
+        if path: print 'exported %d of %d: %s' % (done+1, len(sett.files), path)
+        else: print >> sys.stderr, 'could not export %s: no vowels or mandatory headings not found, check config.txt file' % name
+    if pool:
+        pool.close()
+        pool.join()
 
 def main():
     # this is where the magic happens
     #initialize pygame surfaces and clocks
     pygame.init()    
+    if args.t: # start timing before the files are loaded
+        print 'writing timing trace to ' + trace.toggle()
+    if args.e: # only export the plots
+        exportPlots(plotmishClasses.Settings())
+        trace.stop()
+        pygame.quit()
+        return
     FPSCLOCK = pygame.time.Clock()       
     DISPLAYSURFACE = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT), RESIZABLE) # create window according to dimensions
     plot = plotmishClasses.vowelPlot(DISPLAYSURFACE) 
@@ -982,12 +1174,27 @@ def main():
     initializeSettings(sett, plot)
     # remove praatlog if it exists (it shouldn't but just in case)
     call(['rm', sett.praatLog]) 
+    # wake up the main loop when praat writes the praatLog file
+    sett.visibility = visibility.Visibility()
+    sett.ellipses = ellipses.EllipseCache()
+    sett.density = density.DensityMap()
+    sett.praatWatch = fileWatch.FileWatch(sett.praatLog, PRAATLOG)
+    sett.praatWatch.start()
     while True: # main loop
         ## this is the exciting bit
-        for event in pygame.event.get(): # event handling loop
+        events = pygame.event.get()
+        if not events and not sett.vowelChange: # sleep until there is an event (mouse, keyboard, praatLog...) if there's nothing to redraw
+            events = [pygame.event.wait()] + pygame.event.get()
+        frameStart = time.time() # (the time spent waiting for an event isn't part of the frame)
+        for event in events: # event handling loop
             ## process when quitting the program (hit escape to quit)
             if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
                 quit(sett)           
+            if event.type == KEYDOWN and event.key == K_t and event.mod & KMOD_CTRL: # turn timing on/off
+                path = trace.toggle()
+                print ('writing timing trace to ' if trace.on else 'timing trace written to ') + path
+            if event.type == KEYDOWN and event.key in (K_PAGEUP, K_PAGEDOWN) and args.s and not sett.chooseFormants:
+                switchSpeaker(plot, sett, sett.speaker + (1 if event.key == K_PAGEDOWN else -1)) # go to the next/previous speaker
             if event.type == VIDEORESIZE:
                 resizeScreen(event.size, plot, sett)
                 NOTPLOTRECTS = (pygame.Rect(plot.width,0,WINDOWWIDTH - plot.width, plot.height),
@@ -1016,8 +1223,8 @@ def main():
 
                 for b in sett.permButtons[1]: # deal with buttons on right side of the screen
                     b.font = smallButtonFont # makes sure button isn't bolded (happens for some reason ?)
-                    # button says 'Saved' if all changes have been saved and 'Save' otherwise
-                    if 'Saved' in b.caption and plot.allLogs != {f[0]:[] for f in sett.files}:
+                    # button says 'Saved' if all changes have been saved and 'Save' otherwise (or if saving failed)
+                    if 'Saved' in b.caption and (plot.allLogs != {f[0]:[] for f in sett.files} or sett.corrections.failed):
                         b.caption = 'Save'
                         sett.vowelChange = True
                     # button says Rmv if there are filtered tokens (can't filter by both word and duration at the same time)
@@ -1033,7 +1240,7 @@ def main():
                             allVowels(plot, sett, showAll = False)
                         if b.caption == 'Play': # start/stop play mode
                             togglePlay(sett, b)
-                        if 'Std Dev' in b.caption: # draw ellipses based on 1-3 standard deviations from the mean (will not work if numpy not found)
+                        if 'Std Dev' in b.caption: # draw ellipses based on 1-3 standard deviations from the mean
                             drawEllipse(sett, plot, b)
                         if 'Remeasure' in b.caption: # change remeasurement mode (praat, %duration, max formants)
                             if b.caption == 'Remeasure%':
@@ -1066,11 +1273,17 @@ def main():
                             sett.vowelChange = True
                         
                         if 'Save' in b.caption: # save all changes to -corrLog.csv files
-                            writeLogs(plot)
+                            append = args.a or plot.firstSave # only write over the log files the first time saving this session
+                            plot.firstSave = True
+                            logs = plot.allLogs
+                            sett.corrections.save(lambda: writeLogs(logs, append)) # written in the background (see correctionJournal)
+                            if args.s: # saved changes are shown again if a speaker is unloaded and reloaded
+                                for sp in sett.speakers:
+                                    if plot.allLogs[sp.files[0]]: sp.resumed = True
                             plot.allLogs = {f[0]:[] for f in sett.files}
                             b.caption = 'Saved'
                             sett.vowelChange = True
-                            sett.displayMemory = [[v for v in plot.vowButtons]]
+                            sett.journal.clear()
                         
                         if 'U'.decode('utf8') == b.caption: # change from union to intersect mode (for arp and celex vowels)
                             sett.vowelMode = 'intersect'
@@ -1081,11 +1294,11 @@ def main():
                             b.caption = 'U'.decode('utf8')
                             sett.vowelChange = True
  
-                        if b.caption == 'Undo': # undo previous change by restoring the last entry in displayMemory and logMemory
-                            plot.vowButtons = sett.displayMemory.pop()
-                            plot.allLogs = copy.deepcopy(sett.logMemory.pop())
-                            if len(sett.displayMemory) < 2: sett.displayMemory = [[v for v in plot.vowButtons]]
-                            if len(sett.logMemory) <2: sett.logMemory = [copy.deepcopy(plot.allLogs)]
+                        if b.caption == 'Undo': # undo the previous change (hold shift to redo the last change undone)
+                            if pressed[shft[0]] or pressed[shft[1]]:
+                                plot.vowButtons = sett.journal.redo(plot.vowButtons, plot.allLogs)
+                            else:
+                                plot.vowButtons = sett.journal.undo(plot.vowButtons, plot.allLogs)
                             sett.vowelChange = True
                         
                         if b.caption == 'Rmv. Bad': # change the reason to remove a vowel (because it's bad or because its been checked and is ok)
@@ -1114,15 +1327,25 @@ def main():
                         
                         if b.caption == 'Check Last': # open praat to the last vowel measured (does not allow remeasuring)
                             if sett.lastVowel: 
-                                call(['open', args.p])
-                                call(['support_scripts/sendpraat', '0', 'praat', 'execute \"'+join(os.getcwd(),'support_scripts/zoomIn.praat')+'\" \"' + sett.lastVowel.wFile + '\" \"'+join(os.getcwd(),'praatLog')+ '\" ' + sett.lastVowel.time + ' 0 ' + sett.lastVowel.maxForm+'"'])
+                                with trace.timed('praat'):
+                                    call(['open', args.p])
+                                    call(['support_scripts/sendpraat', '0', 'praat', 'execute \"'+join(os.getcwd(),'support_scripts/zoomIn.praat')+'\" \"' + sett.lastVowel.wFile + '\" \"'+join(os.getcwd(),'praatLog')+ '\" ' + sett.lastVowel.time + ' 0 ' + sett.lastVowel.maxForm+'"'])
 
                         if b.caption == 'Resume' and b.bgcolor != Color('darkolivegreen4'): # set vowels on the screen according to remeasurements in the log files
                             resumeFromLog(sett, plot)
+                            if args.s: sett.speakers[sett.speaker].resumed = True
                             b.bgcolor = Color('darkolivegreen4') 
                             sett.vowelChange = True
 
-                if plot.currentVowel and 'click' in plot.currentVowel.button.handleEvent(event) and not pressCTRLA: # if a vowel button is clicked
+                if sett.gridChange: # find vowels under the mouse in a grid of the vowels currently displayed on screen
+                    sett.tokenGrid = tokenGrid.TokenGrid(sett.vowList if not plot.density else [], sett.tokenGrid) # vowels can't be scrolled over on the density map
+                    sett.gridChange = False
+                if sett.zoomLines or pressCTRLA: # the mouse is drawing a zoom or selection box
+                    entered, clicked = [], []
+                else:
+                    entered, clicked = sett.tokenGrid.handleEvent(event) # vowels the mouse has moved onto or clicked
+
+                if plot.currentVowel and plot.currentVowel in clicked and not pressCTRLA: # if a vowel button is clicked
                     if pressed[ctrl[0]] or pressed[ctrl[1]]:   # hold control to remove the vowel
                         reason = ''
                         if pressed[shft[0]] or pressed[shft[1]]: # hold shift as well to add a comment before removing
@@ -1131,22 +1354,19 @@ def main():
                                 sett.vowelChange = True
                                 break
                         # reset buttons and appropriate lists and update memory
-                        sett.displayMemory += [[v for v in plot.vowButtons]]
-                        sett.logMemory += [copy.deepcopy(plot.allLogs)]
                         sett.vowelChange = True
-                        clear(plot.currentVowel, reason, plot)
-                        plot.vowButtons.remove(plot.currentVowel) 
+                        changeVowels(sett, plot, [plot.currentVowel], lines = [clear(plot.currentVowel, reason, plot)])
                         plot.currentVowel = None
                         textList = []
 
-                    else: # remeasure vowel 
-                        sett.displayMemory += [[v for v in plot.vowButtons]] # update memory
-                        sett.logMemory += [copy.deepcopy(plot.allLogs)]    
+                    else: # remeasure vowel (the change is recorded to be undone when the new measurement is chosen)
                         if sett.praatMode: # remeasure using praat (start by opening praat and going to appropriate location)
                             call(['rm', sett.praatLog])
                             message = 'runScript: \"support_scripts/zoomIn.praat\", %r, %r' % (plot.currentVowel.wFile,float(plot.currentVowel.time))
-                            call(['open', args.p])
-                            call(['support_scripts/sendpraat', '0', 'praat', 'execute \"'+join(os.getcwd(),'support_scripts/zoomIn.praat')+'\" \"' + plot.currentVowel.wFile + '\" \"'+join(os.getcwd(),'praatLog')+ '\" ' + plot.currentVowel.time + ' 1 '+plot.currentVowel.maxForm+'"'])  
+                            with trace.timed('praat'):
+                                call(['open', args.p])
+                                call(['support_scripts/sendpraat', '0', 'praat', 'execute \"'+join(os.getcwd(),'support_scripts/zoomIn.praat')+'\" \"' + plot.currentVowel.wFile + '\" \"'+join(os.getcwd(),'praatLog')+ '\" ' + plot.currentVowel.time + ' 1 '+plot.currentVowel.maxForm+'"'])  
+                            trace.send('praat round trip') # until the measurements are read from the praatLog file
                             sett.chooseFormants = True
                                
                         elif sett.formType in plot.currentVowel.remeasureOpts: 
@@ -1155,9 +1375,7 @@ def main():
                                 x,y = calculateVowelLocation(xform, plot)
                                 buttonRect = pygame.Rect(x,y, 8, 8)
                                 buttonRect.center = (x,y)
-                                button = pygbutton.PygButton(buttonRect, '►'.decode('utf8'),border = False) # make new button for each alternate formant
-                                button.bgcolor = BLACK # set colour of alternate formants to black
-                                button.fgcolor = BLACK
+                                button = tokenLayer.TokenMark(buttonRect, vowelCaption, BLACK, BLACK) # make new black button for each alternate formant
                                 alt = plot.currentVowel.makeAlternate(xform[0],xform[1],button)
                                 if sett.formType == 'dur': # set new time or maxForms if changed 
                                     alt.time = str(round(((float(alt.duration)/1000.0)*((i+1)*0.2))+float(alt.timeRange[0]),3))
@@ -1168,41 +1386,36 @@ def main():
                             x,y = calculateVowelLocation((plot.currentVowel.F1,plot.currentVowel.F2), plot)
                             buttonRect = pygame.Rect(x,y, 10, 10)
                             buttonRect.center = (x,y)
-                            button = pygbutton.PygButton(buttonRect, '◉'.decode('utf8'), border = False) # make new button 
-                            button.bgcolor = WHITE 
-                            button.fgcolor = plot.currentVowel.button.fgcolor
+                            button = tokenLayer.TokenMark(buttonRect, origCaption, WHITE, plot.currentVowel.button.fgcolor) # make new button 
                             alt = plot.currentVowel.makeAlternate(plot.currentVowel.F1,plot.currentVowel.F2, button)
                             plot.xFormButtons += [alt]
                             sett.chooseFormants = True
 
-                for v in sett.vowList: # deal with all vowels currently displayed on screen
-                    if 'enter' in v.button.handleEvent(event):
-                        # write the vowel information to the display bit (lower right of the screen)
-                        writeInfo(v,plot)
-                        plot.currentVowel = v
-                        if sett.play: # play the vowel sound (if play mode is on), plays 25 milliseconds on either side of measurement point
+                for v in entered: # deal with all vowels currently displayed on screen that the mouse has moved onto
+                    # write the vowel information to the display bit (lower right of the screen)
+                    writeInfo(v,plot)
+                    plot.currentVowel = v
+                    if sett.play: # play the vowel sound (if play mode is on), plays 25 milliseconds on either side of measurement point
+                        with trace.timed('sox', vowel = v.id):
                             call(['play',v.wFile,'trim',str(float(v.time)-0.1), '='+str(float(v.time)+0.1)])  
                 
             else:  # if chooseFormants == True
                 if sett.praatMode: 
                     if not plot.xFormButtons: # make alternate button for current F1 and F2 values (white button)
                         buttonRect = plot.currentVowel.button.rect.inflate(2,2)
-                        button = pygbutton.PygButton(buttonRect, '◉'.decode('utf8'), border = False)
-                        button.bgcolor = WHITE
-                        button.fgcolor = plot.currentVowel.button.fgcolor 
+                        button = tokenLayer.TokenMark(buttonRect, origCaption, WHITE, plot.currentVowel.button.fgcolor)
                         alt = plot.currentVowel.makeAlternate(plot.currentVowel.F1, plot.currentVowel.F2 ,button)
                         plot.xFormButtons = [alt]
                     if isfile(sett.praatLog): # this file exists if Log1 has been pressed in the open praat window
                         sett.praatInfo = [(p.split()[0].strip(), p.split()[1].strip() ,p.split()[2].strip(), p.split()[3].strip()) for p in open(sett.praatLog,'rU').readlines()]
                         call(['rm',sett.praatLog])
+                        trace.since('praat round trip')
                     if sett.praatInfo: # if a vowel has been remeasured in praat this will have info in it: (f1,f2,f0)
                         for p in sett.praatInfo: # make a button on the screen for each vowel measured in praat
                             x,y = calculateVowelLocation((float(p[1]),float(p[2])), plot)
                             buttonRect = pygame.Rect(x,y, 8, 8)
                             buttonRect.center = (x,y)
-                            button = pygbutton.PygButton(buttonRect, '►'.decode('utf8'), border = False)
-                            button.bgcolor = BLACK
-                            button.fgcolor = BLACK 
+                            button = tokenLayer.TokenMark(buttonRect, vowelCaption, BLACK, BLACK)
                             alt = plot.currentVowel.makeAlternate(float(p[1]),float(p[2]),button)
                             alt.time = str(round(float(p[0]),3))
                             try: alt.pitch = p[3]
@@ -1219,55 +1432,56 @@ def main():
                             sett.vowelChange = True
                             
 
-                for x in plot.xFormButtons: # choose new formant
-                    if 'click' in x.button.handleEvent(event): # click on black or white button to set new vowel location 
-                        for vb in plot.vowButtons: 
-                            if vb.button is x.origButton:  # change old vowel to remeasured one
-                                x.button.fgcolor = vb.button.bgcolor if vb.button.bgcolor != WHITE else vb.button.fgcolor
-                                x.button.bgcolor = WHITE
-                                if x.button.caption != '►'.decode('utf8'):
-                                    x.button.caption = '►'.decode('utf8')
-                                    b.rect = b.rect.inflate(-2,-2)
-                                plot.vowButtons.remove(vb)
-                                plot.vowButtons.append(x)
-                                currentVowel = x
-                                call(['support_scripts/sendpraat', '0', 'praat', 'Quit'])
-                                plot.oldv = vb
-                        # write the information of the changed vowel to the list (to write to the log file later)
-                        newInfo = [str(wr) for wr in [plot.oldv.id, x.name,x.word,plot.oldv.time,x.time,x.duration,x.stress,x.maxForm,plot.oldv.F1,x.F1,plot.oldv.F2,x.F2]]
-                        plot.allLogs[plot.oldv.wFile] += [newInfo]
-                        sett.chooseFormants = False
-                        plot.xFormButtons = []
-                        writeInfo(x,plot)
-                        sett.praatInfo = []
-                        sett.lastVowel = plot.currentVowel              
-                        sett.vowelChange = True
+                if not sett.candidateGrid or sett.candidateGrid.tokens != plot.xFormButtons:
+                    sett.candidateGrid = tokenGrid.TokenGrid(plot.xFormButtons)
+                for x in sett.candidateGrid.handleEvent(event)[1]: # choose new formant (click on black or white button to set new vowel location)
+                    for vb in plot.vowButtons: 
+                        if vb.button is x.origButton:  # change old vowel to remeasured one
+                            x.button.fgcolor = vb.button.bgcolor if vb.button.bgcolor != WHITE else vb.button.fgcolor
+                            x.button.bgcolor = WHITE
+                            if x.button.caption != vowelCaption:
+                                x.button.caption = vowelCaption
+                                b.rect = b.rect.inflate(-2,-2)
+                            x = commitVowel(x, plot) # write the new measurement to the token store
+                            currentVowel = x
+                            call(['support_scripts/sendpraat', '0', 'praat', 'Quit'])
+                            plot.oldv = vb
+                            break
+                    else: continue # the vowel has already been replaced (by another alternate under the mouse)
+                    # write the information of the changed vowel to the list (to write to the log file later)
+                    newInfo = [str(wr) for wr in [plot.oldv.id, x.name,x.word,plot.oldv.time,x.time,x.duration,x.stress,x.maxForm,plot.oldv.F1,x.F1,plot.oldv.F2,x.F2]]
+                    changeVowels(sett, plot, [plot.oldv], [x], [(plot.oldv.wFile, newInfo)]) # replace the old vowel with the remeasured one
+                    sett.chooseFormants = False
+                    plot.xFormButtons = []
+                    writeInfo(x,plot)
+                    sett.praatInfo = []
+                    sett.lastVowel = plot.currentVowel              
+                    sett.vowelChange = True
         
-        for b in sett.permButtons[1]: # make a list of which stress types are displayed (0,1,2)
-            if b.caption in ['1','2','0']:
-                if plot.filtered: b.bgcolor = Color("darkolivegreen4")
-                if b.bgcolor == Color("darkolivegreen2"):                            
-                    plot.stressFiltered += [b.caption]
-
+        trace.add('events', frameStart, time.time() - frameStart, events = len(events))
         if sett.vowelChange: # if the vowel plot needs to be updated
-            sett.vowList = []
-            if sett.vowelMode == 'intersect': # update displayed as intersect of celex and arpabet vowels
-                for v in plot.vowButtons:    
-                        if (v.name in plot.arpDisplayed) and (v.altVow in plot.altDisplayed):
-                            sett.vowList += [v] if v not in plot.filtered else []
-            else: # update displayed as union of celex and arpabet vowels
-                for v in plot.vowButtons:    
-                    if (v.name in plot.arpDisplayed) or (v.altVow in plot.altDisplayed):
-                        sett.vowList += [v] if  v not in plot.filtered else []
-        
-        # only let those with the allowed stress be displayed
-        sett.vowList = [v for v in sett.vowList if v.stress not in plot.stressFiltered and v.inPlot(plot)]
-        plot.stressFiltered = []
+            for b in sett.permButtons[1]: # make a list of which stress types are displayed (0,1,2)
+                if b.caption in ['1','2','0']:
+                    if plot.filtered: b.bgcolor = Color("darkolivegreen4")
+                    if b.bgcolor == Color("darkolivegreen2"):                            
+                        plot.stressFiltered += [b.caption]
+            # update displayed as intersect or union of celex and arpabet vowels (only those
+            # with the allowed stress that aren't filtered and are in the zoomed in area)
+            with trace.timed('visibility'):
+                sett.vowList = sett.visibility.visible(plot, sett.vowelMode, plot.stressFiltered)
+            plot.stressFiltered = []
+            sett.gridChange = True # vowels on the screen (or their locations) may have changed
+            with trace.timed('ellipses'):
+                updateEllipses(sett, plot)
+            with trace.timed('density'):
+                updateDensity(sett, plot)
 
         # draw everything to the screen
-        drawToScreen(sett, plot, NOTPLOTRECTS)
+        with trace.timed('drawToScreen'):
+            drawToScreen(sett, plot, NOTPLOTRECTS)
+        trace.frame(frameStart)
         
-        FPSCLOCK.tick(sett.FPS) # screen updates at 10 frames per second (unless FPS set to something else)
+        FPSCLOCK.tick(sett.FPS) # screen updates at most 10 frames per second (unless FPS set to something else, eg. when dragging a selection)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -3,7 +3,7 @@ from pygame.locals import *
 
 sys.path.append('support_scripts')
 
-import pygame, pygbutton, inputbox
+import pygame, pygbutton, inputbox, corpusManifest
 
 WINDOWWIDTH, WINDOWHEIGHT = 500, 750
 
@@ -17,6 +17,8 @@ updateFormants = os.path.join(os.getcwd(),'updateFormants.py')
 
 plotmish = os.path.join(os.getcwd(), 'plotmish.py')
 
+manifest = corpusManifest.Manifest(os.path.join(os.getcwd(),'cache'))
+
 FPS = 10
 
 WHITE = (255, 255, 255)
@@ -91,8 +93,9 @@ def checkDefaults():
 		if k == 'pitch tracks':
 			if not os.path.isdir(v) and v:
 				bad.append(k+' path does not exist')
-			elif not glob.glob(os.path.join(os.path.basename(v),'*.Pitch')) and v:
+			elif v and not manifest.scan(v)['pitch']:
 				bad.append('no Pitch files found in '+k+' folder')
+			manifest.save()
 		if k == 'corrected':
 			if not os.path.isdir(v) and v:
 				bad.append(k+' path does not exist')
@@ -0,0 +1,36 @@
+#lookup table of the primary pronunciation of every word in cmu.txt
+#(see lookupTable) so all of cmu.txt doesn't have to be read into a
+#dictionary every time plotmish is started
+import lookupTable
+
+def primaryProns(cmuFile):
+    # returns a dictionary with the primary pronunciation for all
+    # words in cmu.txt. Primary pronunciation is the pron with the
+    # most segments and the least schwa (AH0) vowels
+    cmuF = open(cmuFile)
+    lines = cmuF.readlines()
+    cmuF.close()
+    cmuDict = {}
+    for l in lines:
+        word = l.split(' ',1)[0].strip()
+        pron = l.split(' ',1)[1].strip().split()
+        if word not in cmuDict:
+            cmuDict[word] = pron
+        elif len(pron) > len(cmuDict[word]):
+            cmuDict[word] = pron
+        elif len(pron) == len(cmuDict[word]) and len([p for p in pron if p in ['AH0', 'IH0']]) < len([p for p in cmuDict[word] if p in ['AH0', 'IH0']]):
+            cmuDict[word] = pron
+    return cmuDict
+
+class CmuLookup(lookupTable.LookupTable):
+    # primary cmu pronunciations by word, used like a dictionary:
+    # lookup[word] returns the pronunciation as a list of phones
+    # (raises KeyError if the word is not in cmu.txt)
+    name = 'cmu'
+    version = 1
+
+    def __init__(self, cmuFile, cacheDir):
+        lookupTable.LookupTable.__init__(self, cmuFile, cacheDir, lambda f: {w: ' '.join(p) for w,p in primaryProns(f).items()})
+
+    def __getitem__(self, word):
+        return self.lookup(word).split(' ')
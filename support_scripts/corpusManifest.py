@@ -0,0 +1,70 @@
+#finds the wav, formant.txt, pitch track (.Pitch) and log (-corrLog.csv)
+#files in the corpus folders by recording id (ie. the name of the wav file
+#without .wav) so files can be paired up without comparing every file name
+#to every other one. The list of files in each folder is saved in the
+#cache folder and a folder is only listed again if it has changed
+import os, time, cPickle
+from os.path import join, basename
+import parseCache
+
+# change this when the format of the manifest changes so old manifests are not used
+manifestVersion = 1
+
+def recordingId(name):
+    # returns (kind of file, recording id) for a file name, kind is one of
+    # wav, formant, pitch, log or None for any other file
+    name = basename(name)
+    if name.endswith('.wav'):
+        return 'wav', name[:-len('.wav')]
+    if name.endswith('-corrLog.csv'):
+        return 'log', name[:-len('-corrLog.csv')]
+    if name.endswith('.Pitch'):
+        return 'pitch', name[:-len('.Pitch')]
+    if name.endswith('txt') and 'formant.txt' in name:
+        return 'formant', name[:name.rindex('formant.txt')].rstrip('-_. ')
+    return None, os.path.splitext(name)[0]
+
+class Manifest(object):
+    # files in each corpus folder: scan(folder) returns a dict of
+    # kind -> {recording id: path} (other files are under 'other' by name)
+    def __init__(self, cacheDir):
+        self.path = join(cacheDir, 'manifest.pickle')
+        self.folders = {}
+        self.changed = False
+        try:
+            manifestF = open(self.path, 'rb')
+            saved = cPickle.load(manifestF)
+            manifestF.close()
+            if saved.get('version') == manifestVersion:
+                self.folders = saved['folders']
+        except Exception:
+            pass # unreadable manifests are rewritten
+
+    def scan(self, folder):
+        # returns the files in folder (paths are joined to folder as given)
+        key = os.path.abspath(folder)
+        mtime = os.stat(folder).st_mtime
+        entry = self.folders.get(key)
+        # reuse the saved list if the folder hasn't changed since (and wasn't
+        # being changed while) it was last listed
+        if not entry or entry['mtime'] != mtime or entry['mtime'] >= entry['scanned'] - 1:
+            files = {'wav': {}, 'formant': {}, 'pitch': {}, 'log': {}, 'other': {}}
+            for name in sorted(os.listdir(folder)):
+                if name.startswith('.'): continue # hidden files
+                kind, rId = recordingId(name)
+                if kind is None:
+                    files['other'][name] = name
+                elif rId not in files[kind]:
+                    files[kind][rId] = name
+            entry = {'mtime': mtime, 'scanned': time.time(), 'files': files}
+            self.folders[key] = entry
+            self.changed = True
+        return {kind: {k: join(folder, name) for k,name in names.items()} for kind,names in entry['files'].items()}
+
+    def save(self):
+        # write the manifest to the cache folder if any folder was listed again
+        # (scanning still works if it can't be written)
+        if not self.changed: return
+        saved = {'version': manifestVersion, 'folders': self.folders}
+        if parseCache.atomicWrite(self.path, lambda f: cPickle.dump(saved, f, 2)):
+            self.changed = False
@@ -0,0 +1,153 @@
+#journal of the lines written to the log (vowels removed or remeasured)
+#since the last save. Every line is added to the end of the journal file
+#as soon as it's made (and taken back again when it's undone), the file is
+#written and synced to disk by a background thread. If plotmish crashes
+#before the changes are saved they can be recovered from the journal the
+#next time it is started (see recover). Saving writes the -corrLog.csv
+#files in the background thread as well and then empties the journal. If
+#the journal or the log files can't be written the journal is kept (a save
+#that failed is tried again with the next one) so nothing is lost
+import csv, os, sys, fcntl, threading, Queue
+from os.path import isdir, join
+
+class CorrectionJournal(threading.Thread):
+    # rows of the journal file are ['+', wav file, log line...] for a line
+    # added to the log of wav file and ['-', wav file] for the last line of
+    # that log taken back, the first row says whether the log files had
+    # already been saved to (so the lines are appended to them)
+    # (every row ends with '.' so a row that was only partly written is ignored)
+    # every plotmish has its own journal (.annotator-process id-journal.csv in
+    # folder) and keeps it locked while it's running, so the journal of a
+    # plotmish that is still running is never recovered by another one
+    def __init__(self, folder, annotator):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.folder = folder
+        self.annotator = annotator
+        self.path = join(folder, '.%s-%d-journal.csv' % (annotator, os.getpid()))
+        self.queue = Queue.Queue()
+        self.file = None
+        self.recovered = [] # (locked) journal files read by recover, deleted by begin
+        self.unsaved = [] # saves (see save) that failed, oldest first
+        self.failed = False # True if the journal or the log files couldn't be written
+
+    def journals(self):
+        # paths of the journals of annotator in folder
+        if not isdir(self.folder): return []
+        prefix, suffix = '.'+self.annotator+'-', '-journal.csv'
+        return [join(self.folder, p) for p in os.listdir(self.folder) if p.startswith(prefix) and p.endswith(suffix) and p[len(prefix):-len(suffix)].isdigit()]
+
+    def recover(self):
+        # returns a list of (dict of wav file -> log lines, whether to append them to the log files)
+        # of the changes in the journals left by sessions that didn't quit (oldest first)
+        found = []
+        for path in self.journals():
+            try:
+                f = open(path, 'rb')
+            except IOError: # deleted since it was listed
+                continue
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError: # locked by a plotmish that is running (or recovering it)
+                f.close()
+                continue
+            info = os.fstat(f.fileno())
+            if info.st_nlink == 0: # deleted by a plotmish that just quit
+                f.close()
+                continue
+            self.recovered.append(f)
+            found.append((info.st_mtime, self.read(f)))
+        return [changes for mtime,changes in sorted(found)]
+
+    def read(self, f):
+        # (dict of wav file -> log lines, append) of the journal file f
+        logs, append = {}, False
+        for row in csv.reader(f):
+            if not row or row[-1] != '.': continue
+            if row[0] == 'append':
+                append = row[1] == 'True'
+            elif row[0] == '+':
+                logs.setdefault(row[1], []).append(row[2:-1])
+            elif row[0] == '-' and logs.get(row[1]):
+                logs[row[1]].pop()
+        return logs, append
+
+    def begin(self, append):
+        # start a new journal (append is whether the lines will be appended to the log files when saving),
+        # the recovered journals are deleted (their changes have been written to the log files)
+        for f in self.recovered:
+            os.remove(f.name)
+            f.close()
+        self.recovered = []
+        if not isdir(self.folder): os.makedirs(self.folder)
+        self.file = open(self.path, 'ab') # (emptied by restart once it's locked)
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        self.restart(append)
+        self.start()
+
+    def restart(self, append):
+        # empty the journal file
+        self.file.seek(0)
+        self.file.truncate()
+        csv.writer(self.file).writerow(['append', str(append), '.'])
+        self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def add(self, wFile, line):
+        # a line was added to the log of wFile
+        self.queue.put(['+', wFile] + list(line) + ['.'])
+
+    def pop(self, wFile):
+        # the last line of the log of wFile was taken back
+        self.queue.put(['-', wFile, '.'])
+
+    def save(self, write):
+        # write() writes the log files, it's called in the background thread
+        # and then the journal is emptied (the lines in it have been saved)
+        self.queue.put(write)
+
+    def stop(self):
+        # finish writing and delete the journal (changes that weren't saved are discarded), the journal
+        # is kept if it couldn't be written or a save failed (so the changes are recovered next time)
+        if self.is_alive():
+            self.queue.put(None)
+            self.join()
+        if self.failed or self.unsaved:
+            print >> sys.stderr, 'WARNING: not all changes were saved, they will be recovered from %s the next time plotmish is started' % self.path
+
+    def error(self, e):
+        self.failed = True
+        print >> sys.stderr, 'ERROR: could not write the changes (%s), they are kept in %s' % (e, self.path)
+
+    def run(self):
+        writer = csv.writer(self.file)
+        while True:
+            batch = [self.queue.get()] # wait for something to write and write everything waiting at once
+            try:
+                while True: batch.append(self.queue.get_nowait())
+            except Queue.Empty:
+                pass
+            for item in batch:
+                if item is None: # (deleted before it's unlocked so no other plotmish recovers it)
+                    if not (self.failed or self.unsaved): os.remove(self.path)
+                    self.file.close()
+                    return
+                try:
+                    if callable(item):
+                        self.unsaved.append(item)
+                        while self.unsaved: # (saves that failed before are tried again first)
+                            self.unsaved[0]()
+                            self.unsaved.pop(0)
+                        self.restart(True)
+                        self.failed = False
+                    else:
+                        writer.writerow(item)
+                except Exception as e: # the journal is kept until the changes are saved
+                    self.error(e)
+            try:
+                self.sync()
+            except (IOError, OSError) as e:
+                self.error(e)
@@ -0,0 +1,88 @@
+#indexed database of the corrections made in plotmish (corrections.db in
+#the log folder). Every line in a -corrLog.csv file is also a row in the
+#database with the recording, vowel token, annotator and time it was
+#saved, so the latest correction of each token can be looked up without
+#reading whole log files. The -corrLog.csv files are still what is saved:
+#the database keeps the size and modification time of the log file its
+#rows are from and is only used while the log file is unchanged (see
+#current). The database is opened in WAL mode so it can be read (by
+#plotmish processes or updateFormants.py) while it's being written to
+import os, csv, time, sqlite3, threading, itertools
+from os.path import join, isfile, getmtime
+
+dbName = 'corrections.db'
+
+# columns of a log line (the columns of the -corrLog.csv files, note is only
+# written for removed vowels)
+lineColumns = ('vowel', 'word', 'oldTime', 'time', 'duration', 'stress', 'maxForms', 'oldF1', 'F1', 'oldF2', 'F2', 'note')
+header = ['annotator','id','vowel','word','oldTime','time','duration (ms)','stress','maxForms','oldF1','F1','oldF2','F2']
+
+def readCsv(logFile):
+    # returns the lines of a -corrLog.csv file (without the header)
+    with open(logFile, 'rU') as f:
+        return [l for l in list(csv.reader(f))[1:] if len(l) > 1]
+
+class CorrectionStore(object):
+    def __init__(self, folder):
+        self.path = join(folder, dbName)
+        self.conn = None # ((process id, thread), connection) to the database
+
+    def connection(self):
+        # connection to the database (a new one in each process and thread),
+        # the database is made the first time it's connected to
+        key = (os.getpid(), threading.current_thread().ident)
+        if self.conn is None or self.conn[0] != key:
+            conn = sqlite3.connect(self.path, timeout = 30)
+            conn.text_factory = str
+            conn.execute('PRAGMA journal_mode = WAL') # readers don't wait for writers
+            conn.execute('CREATE TABLE IF NOT EXISTS corrections (seq INTEGER PRIMARY KEY, recording TEXT, token INTEGER, annotator TEXT, stamp REAL, %s)' % ', '.join([c+' TEXT' for c in lineColumns]))
+            conn.execute('CREATE INDEX IF NOT EXISTS tokenCorrections ON corrections (recording, token, annotator, stamp)')
+            conn.execute('CREATE TABLE IF NOT EXISTS logFiles (recording TEXT PRIMARY KEY, size INTEGER, mtime REAL)')
+            conn.commit()
+            self.conn = (key, conn)
+        return self.conn[1]
+
+    def current(self, recording, logFile):
+        # True if the rows of a recording are the lines of its log file as it is now
+        # (False if there is no database, it isn't made just to look)
+        if not isfile(self.path) or not isfile(logFile): return False
+        saved = self.connection().execute('SELECT size, mtime FROM logFiles WHERE recording = ?', (recording,)).fetchone()
+        info = os.stat(logFile)
+        return saved == (info.st_size, info.st_mtime)
+
+    def insert(self, conn, recording, annotator, lines, stamp):
+        # add log lines (lists of [vowel id, vowel, word, ...] as in plot.allLogs) of a recording
+        rows = [[recording, int(l[0].split('-')[-1]), annotator, stamp] + (list(l[1:]) + ['']*len(lineColumns))[:len(lineColumns)] for l in lines]
+        conn.executemany('INSERT INTO corrections (recording, token, annotator, stamp, %s) VALUES (%s)' % (', '.join(lineColumns), ', '.join('?'*(len(lineColumns)+4))), rows)
+
+    def logged(self, conn, recording, logFile):
+        # the rows of recording are now the lines of logFile
+        info = os.stat(logFile)
+        conn.execute('INSERT OR REPLACE INTO logFiles VALUES (?, ?, ?)', (recording, info.st_size, info.st_mtime))
+
+    def add(self, recording, annotator, lines, logFile):
+        # add the log lines just added to the end of the recording's log file
+        conn = self.connection()
+        with conn:
+            self.insert(conn, recording, annotator, lines, time.time())
+            self.logged(conn, recording, logFile)
+
+    def rows(self, recording, latest = False):
+        # returns the corrections of a recording as rows of a -corrLog.csv file (in the order they were
+        # saved), only the latest correction of each token if latest
+        query = 'SELECT annotator, token, %s FROM corrections WHERE recording = ?' % ', '.join(lineColumns)
+        if latest: query += ' AND seq IN (SELECT max(seq) FROM corrections WHERE recording = ? GROUP BY token)'
+        query += ' ORDER BY seq'
+        found = self.connection().execute(query, (recording, recording) if latest else (recording,))
+        return [[r[0], str(r[1])] + list(r[2:-1]) + ([r[-1]] if r[-1] else []) for r in found]
+
+    def importCsv(self, recording, logFile):
+        # replace the corrections of a recording with the lines of its log file
+        lines = readCsv(logFile)
+        stamp = getmtime(logFile)
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM corrections WHERE recording = ?', (recording,))
+            for annotator,run in itertools.groupby(lines, lambda l: l[0]): # (keeps the order of the lines)
+                self.insert(conn, recording, annotator, [[recording+'-'+l[1]] + l[2:] for l in run], stamp)
+            self.logged(conn, recording, logFile)
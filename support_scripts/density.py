@@ -0,0 +1,42 @@
+#density map of the vowels displayed on the plot, drawn instead of the
+#vowel tokens when there are too many of them to draw one by one (see the
+#-d argument of plotmish). The plot is split into small square cells and
+#the vowels in each cell are counted: the colour of a cell is the mix of
+#the colours of the vowel classes in it and its strength depends on the
+#(log) number of vowels in the cell
+import pygame
+import numpy as np
+
+WHITE = (255, 255, 255)
+
+class DensityMap(object):
+    def __init__(self):
+        self.key = None # what the last map was made from
+        self.rows = None # token store rows in the last map
+        self.surface = None
+
+    def image(self, layout, rows, size, cell, colours):
+        # returns a surface of size with the density of the token store rows
+        # (at their location in layout) drawn on it in cells of cell pixels,
+        # colours is the colour of each vowel name (white is transparent)
+        key = (layout.store, layout.transform, tuple(size), cell)
+        if self.surface is not None and key == self.key and np.array_equal(rows, self.rows):
+            return self.surface
+        w, h = int(size[0]) // cell + 1, int(size[1]) // cell + 1
+        x, y = layout.locations()[rows].T
+        cells = np.clip(x // cell, 0, w-1)*h + np.clip(y // cell, 0, h-1) # cell index (in surfarray order)
+        table = np.array([colours[n][:3] for n in layout.store.vocab['name']], dtype = float)
+        rgb = table[layout.store['name'][rows]] if len(table) else np.zeros((0,3))
+        count = np.bincount(cells, minlength = w*h)
+        mixed = np.column_stack([np.bincount(cells, rgb[:,c], minlength = w*h) for c in range(3)])
+        filled = count > 0
+        mixed[filled] /= count[filled,None]
+        strength = 0.3 + 0.7*np.log1p(count)/np.log1p(max(count.max(), 1))
+        pixels = 255 - (255 - mixed)*strength[:,None]
+        pixels[~filled] = WHITE
+        pixels = pixels.reshape(w, h, 3).astype(np.uint8)
+        surf = pygame.transform.scale(pygame.surfarray.make_surface(pixels), (w*cell, h*cell))
+        if pygame.display.get_surface(): surf = surf.convert()
+        surf.set_colorkey(WHITE)
+        self.key, self.rows, self.surface = key, np.array(rows), surf
+        return surf
@@ -0,0 +1,57 @@
+#confidence ellipses of the vowels displayed on the plot (of all of them or
+#of each vowel class). The mean and covariance of F1 and F2 of each group
+#of vowels are kept until the vowels in that group change and the outline
+#of an ellipse is calculated directly from them (the outline is in F1/F2 so
+#it only has to be moved to the screen again when zooming or resizing)
+import numpy as np
+
+# unit circle the outlines are made from (one point every 5 degrees)
+angles = np.linspace(0, 2*np.pi, 72, endpoint = False)
+circle = np.vstack((np.cos(angles), np.sin(angles)))
+
+def groupRows(store, rows, byClass):
+    # returns a dict of group name -> sorted token store rows, all rows are
+    # in one group (None) unless byClass, then each vowel class is a group
+    rows = np.sort(rows)
+    if not byClass:
+        return {None: rows}
+    codes = store['name'][rows]
+    order = np.argsort(codes, kind = 'mergesort')
+    codes, rows = codes[order], rows[order]
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    return {store.vocab['name'][c[0]]: r for c,r in zip(np.split(codes, bounds), np.split(rows, bounds)) if len(r)}
+
+def outline(mean, cov, sdev):
+    # returns (F1, F2) arrays of points on the ellipse sdev standard
+    # deviations from the mean (the axes are the eigenvectors of cov)
+    values, vectors = np.linalg.eigh(cov)
+    axes = vectors * np.sqrt(np.clip(values, 0, None))
+    points = mean[:,None] + sdev * axes.dot(circle)
+    return points[0], points[1]
+
+class EllipseCache(object):
+    # mean and covariance of F1 and F2 of each group of vowels
+    def __init__(self):
+        self.store = None
+        self.groups = {} # group name -> (rows, mean, cov)
+
+    def stats(self, store, groups):
+        # returns a dict of group name -> (mean, cov) for the groups (output of
+        # groupRows) with enough vowels for an ellipse, only the groups with
+        # different rows than last time are calculated again
+        if store is not self.store:
+            self.store = store
+            self.groups = {}
+        found = {}
+        for name,rows in groups.items():
+            old = self.groups.get(name)
+            if old is None or not np.array_equal(old[0], rows):
+                formants = np.vstack((store['F1'][rows], store['F2'][rows]))
+                if len(rows) > 1:
+                    old = (rows, formants.mean(1), np.cov(formants))
+                else:
+                    old = (rows, None, None)
+                self.groups[name] = old
+            if old[1] is not None and np.isfinite(old[2]).all():
+                found[name] = old[1:]
+        return found
@@ -0,0 +1,41 @@
+#watches for a file to appear (the praatLog file praat writes when a vowel
+#is remeasured) in a background thread and posts a pygame event when it
+#does, so the plotmish main loop can sleep until something happens
+#instead of checking for the file every frame
+import os, threading
+import pygame
+
+class FileWatch(threading.Thread):
+    # posts an event of type eventType (with the path as event.path) each
+    # time path is created or changed, checking every interval seconds
+    def __init__(self, path, eventType, interval = 0.25):
+        threading.Thread.__init__(self)
+        self.daemon = True # don't keep plotmish running after quitting
+        self.path = path
+        self.eventType = eventType
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def modified(self):
+        # modification time of the file (None if it doesn't exist)
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def run(self):
+        last = self.modified()
+        while not self.stopped.is_set():
+            self.stopped.wait(self.interval)
+            now = self.modified()
+            if now is not None and now != last:
+                try:
+                    pygame.event.post(pygame.event.Event(self.eventType, path = self.path))
+                except pygame.error:
+                    return # pygame has been quit
+            last = now
+
+    def stop(self):
+        # stop watching (waits for the thread to finish)
+        self.stopped.set()
+        if self.is_alive(): self.join()
@@ -0,0 +1,87 @@
+#read-only string lookup tables built from dictionary files (cmu.txt, epw.cd...)
+#a table is built once and saved as sorted numpy arrays of keys and values
+#in the cache folder, later runs memory-map those arrays and look keys up
+#with a binary search instead of reading the whole dictionary into memory.
+#The table is rebuilt when the dictionary file changes
+import os, time
+from os.path import isfile
+import numpy as np
+import parseCache
+
+class LookupTable(object):
+    # subclasses set name and version (change the version when the format
+    # of the table changes so old tables are rebuilt)
+    name = 'table'
+    version = 1
+
+    def __init__(self, sourceFile, cacheDir, build):
+        # build(sourceFile) returns a dict of key -> value (both strings) read from
+        # sourceFile, it's only called if there is no current saved table
+        base = parseCache.cacheFile(sourceFile, (self.name, self.version), cacheDir)[:-len('.npz')]
+        self.keyFile = base+'-keys.npy'
+        self.valueFile = base+'-values.npy'
+        self.sourceFile = base+'-source.npz'
+        if not self.current(sourceFile):
+            table = build(sourceFile)
+            keys = sorted(table)
+            self.keys = np.array(keys, dtype = str)
+            self.values = np.array([table[k] for k in keys], dtype = str)
+            self.write(sourceFile)
+        else:
+            self.keys = np.load(self.keyFile, mmap_mode = 'r')
+            self.values = np.load(self.valueFile, mmap_mode = 'r')
+
+    def current(self, sourceFile):
+        # True if the saved table was built from the current source file
+        if not (isfile(self.keyFile) and isfile(self.valueFile) and isfile(self.sourceFile)):
+            return False
+        try:
+            source = np.load(self.sourceFile)
+            mtime, hash, written = float(source['mtime']), str(source['hash']), float(source['written'])
+            current = parseCache.sameFile(sourceFile, source['size'], mtime, hash, written)
+            source.close()
+        except Exception:
+            return False # unreadable tables are rebuilt
+        if current and parseCache.recordAgain(os.stat(sourceFile), mtime, written):
+            self.writeSource(sourceFile, hash)
+        return current
+
+    def write(self, sourceFile):
+        # save the table (the source info is written last so a partly
+        # written table is never used, lookups still work if it can't be saved)
+        try:
+            if isfile(self.sourceFile): os.remove(self.sourceFile)
+        except OSError:
+            return
+        for path, array in ((self.keyFile, self.keys), (self.valueFile, self.values)):
+            if not parseCache.atomicWrite(path, lambda f: np.save(f, array)):
+                return
+        self.writeSource(sourceFile, parseCache.fileHash(sourceFile))
+
+    def writeSource(self, sourceFile, hash):
+        # save the size, modification time and hash of the source file the table was built from
+        info = os.stat(sourceFile)
+        parseCache.atomicWrite(self.sourceFile, lambda f: np.savez(f, size = info.st_size, mtime = info.st_mtime, hash = hash, written = time.time()))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, key):
+        # binary search for key in the sorted key array, returns its value
+        # (raises KeyError if the key is not in the table)
+        if len(key) > self.keys.dtype.itemsize:
+            raise KeyError(key)
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return str(self.values[i])
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        return self.lookup(key)
+
+    def __contains__(self, key):
+        try:
+            self.lookup(key)
+            return True
+        except KeyError:
+            return False
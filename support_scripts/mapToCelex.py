@@ -1,9 +1,10 @@
 #takes tuple of (word, cmu pronunciation) and maps the vowels
 #to their equivalent in the celex pronunciation
 #If run with saveFile argument it saves word to word pronuciations
-#in a text file for quicker retrieval later on  
-import os, re, sys,  time
+#in an sqlite database for quicker retrieval later on  
+import os, re, sys,  time, sqlite3
 from os import path
+import lookupTable
 '''
 cmuVowels = ['IY', 'IA', 'N~', 'L~', 'NG~', 'AA', 'AE', 'EH', 'AH',
 			 'EA', 'AO', 'IH', 'EY', 'AW', 'AY', 'M~', 'ER', 'UW', 'UH', 'OY', 'OW', 'UA']
@@ -21,21 +22,49 @@ for c in translate.values():
 
 celexPath = path.join(os.getcwd(),'celex.cd')
 
-saveDict = {}
+# folder to keep the indexed celex dictionary in
+cacheDir = path.join(os.getcwd(),'cache')
+
+saveDict = {} # mappings read from or added to the save file this session
+
+newSaves = set() # keys in saveDict that haven't been written to the save file yet
+
+saveFile = None # path to the save file database (see openSaved)
+
+saveConn = None # (process id, connection) to the save file
 
 celDict = {}
 
-def buildCelex():   
-    global celDict, celexPath
-    cel = open(celexPath,'rb').readlines()
-    celDict = {}
+def celexProns(celexFile):
+    # returns a dict of uppercased headword -> its pronunciations in the celex
+    # file (without syllable and stress marks, separated by backslashes)
+    cel = open(celexFile,'rb').readlines()
+    prons = {}
     for word in cel:
         word = word.split('\\')
         upWord = word[1].upper()
-        if upWord in celDict:
-            celDict[upWord] = celDict[upWord] + [[p for p in word[6] if p not in  ['-',"'",'"']]]
-        else:
-            celDict[upWord] = [[p for p in word[6] if p not in  ['-',"'",'"']]]
+        pron = ''.join([p for p in word[6] if p not in  ['-',"'",'"']])
+        prons[upWord] = prons[upWord]+'\\'+pron if upWord in prons else pron
+    return prons
+
+class CelexLookup(lookupTable.LookupTable):
+    # celex pronunciations by uppercased headword (see lookupTable), used like
+    # a dictionary: lookup[word] returns a list of pronunciations (lists of
+    # celex phones) in the order they appear in the celex file
+    name = 'celex'
+    version = 1
+
+    def __init__(self, celexFile, cacheDir):
+        lookupTable.LookupTable.__init__(self, celexFile, cacheDir, celexProns)
+
+    def __getitem__(self, word):
+        return [list(p) for p in self.lookup(word).split('\\')]
+
+def buildCelex():   
+    # open the indexed celex dictionary (built from celexPath the first time
+    # and whenever the celex file changes)
+    global celDict, celexPath
+    celDict = CelexLookup(celexPath, cacheDir)
     assert celDict
     return celDict
 
@@ -104,43 +133,87 @@ def mapVowels(cmu,cel):
     return mapping                    
                                 
 
-def readSaved(saveFile):
-    global saveDict 
-    assert os.path.isfile(saveFile), 'file does not exist %r' %saveFile
-    sF = open(saveFile, 'rb')
-    saveDict = {(s[0],s[1]) : [tuple(w.split() for w in y.split('/')) if ' ' in y else tuple(y.split('/')) for y in s[2].split('//')] for s in [x.strip('\n').split('  ') for x in sF.readlines()]}
+def encodeMapping(p):
+    # mapping as a string: cmu/celex pairs separated by '//'
+    p = list(p)
+    for e in range(len(p)):
+        if isinstance(p[e][0],list):
+            p[e] = '/'.join([' '.join(i) for i in p[e]])
+        else:
+            p[e] = '/'.join(p[e])
+    return '//'.join(p)
+
+def decodeMapping(y):
+    # inverse of encodeMapping
+    if not y: return ''
+    return [tuple(w.split() for w in x.split('/')) if ' ' in x else tuple(x.split('/')) for x in y.split('//')]
+
+def readSavedText(textFile):
+    # reads mappings from a save file in the old text format (celexStore.txt)
+    sF = open(textFile, 'rb')
+    saved = {(s[0],s[1]) : decodeMapping(s[2]) for s in [x.strip('\n').split('  ') for x in sF.readlines()]}
     sF.close()
-    return saveDict
-
-def writeSaved(saveFile):
-    saveF = open(saveFile, 'a')
-    for w,p in saveDict.items():
-        for e in range(len(p)):
-            if isinstance(p[e][0],list):
-                p[e] = '/'.join([' '.join(i) for i in p[e]])
-            else:
-                p[e] = '/'.join(p[e])
-        p = '//'.join(p)
-        saveF.write(w[0]+'  '+str(w[1])+'  '+p+'\n')
-    saveF.close()
-
-def newSaveFile(saveFile):
-    saveF = open(saveFile, 'wb')
-    saveF.close()
+    return saved
+
+def connection():
+    # connection to the save file (a new one in each process)
+    global saveConn
+    if saveConn is None or saveConn[0] != os.getpid():
+        conn = sqlite3.connect(saveFile)
+        conn.text_factory = str
+        saveConn = (os.getpid(), conn)
+    return saveConn[1]
+
+def openSaved(path, oldTextFile = None):
+    # use path as the save file (made if it doesn't exist yet)
+    # mappings in oldTextFile are copied into a new save file
+    global saveFile, saveConn
+    new = not os.path.isfile(path)
+    saveFile = path
+    saveConn = None
+    conn = connection()
+    conn.execute('CREATE TABLE IF NOT EXISTS mappings (word TEXT, pron TEXT, mapping TEXT, PRIMARY KEY (word, pron))')
+    conn.commit()
+    if new and oldTextFile and os.path.isfile(oldTextFile):
+        addSaved(readSavedText(oldTextFile))
+        writeSaved()
+
+def getSaved(word, pron):
+    # returns the saved mapping for a word and its (joined) cmu pronunciation
+    # raises KeyError if the word hasn't been mapped before
+    key = (word.upper(), pron)
+    if key not in saveDict:
+        row = connection().execute('SELECT mapping FROM mappings WHERE word = ? AND pron = ?', key).fetchone()
+        if row is None: raise KeyError(key)
+        saveDict[key] = decodeMapping(row[0])
+    return saveDict[key]
+
+def addSaved(saves):
+    # add new mappings (dict of (word, pron) -> mapping) to be written by writeSaved
+    saveDict.update(saves)
+    newSaves.update(saves)
+
+def writeSaved():
+    # write the mappings added since the last call to the save file
+    if not newSaves: return
+    conn = connection()
+    conn.executemany('INSERT OR REPLACE INTO mappings VALUES (?, ?, ?)', [(w, p, encodeMapping(saveDict[(w,p)])) for w,p in newSaves])
+    conn.commit()
+    newSaves.clear()
 
 def mapToCelex(word, pron, makeSave = False):
-    global celDict, saveDict
+    global celDict
     if not celDict:
         buildCelex()
     word = word.upper()
     if word not in celDict:
         if makeSave: 
-            saveDict[(word,''.join(pron))] = ''
+            addSaved({(word,''.join(pron)): ''})
         return ''
     celPron = celDict[word]
     mapped = mapVowels(pron,celPron[0])
     if makeSave: 
-        saveDict[(word,''.join(pron))] = mapped 
+        addSaved({(word,''.join(pron)): mapped})
     return mapped
 
 
@@ -0,0 +1,91 @@
+#keeps parsed copies of input files (formant.txt files, pitch tracks...)
+#as .npz files so that files that haven't changed don't have to be
+#parsed again every time plotmish is started
+import os, time, hashlib
+from os.path import join, isfile
+import numpy as np
+
+# change this when the format of any cached table changes so old cache files are not used
+cacheVersion = 4
+
+def cacheFile(path, key, cacheDir):
+    # name of the cache file for path read with the settings in key
+    key = repr((cacheVersion, os.path.abspath(path), key))
+    return join(cacheDir, hashlib.sha1(key).hexdigest()+'.npz')
+
+def fileHash(path):
+    # sha1 hash of the contents of a file
+    h = hashlib.sha1()
+    f = open(path, 'rb')
+    for chunk in iter(lambda: f.read(1<<20), ''):
+        h.update(chunk)
+    f.close()
+    return h.hexdigest()
+
+def sameFile(path, size, mtime, hash, written):
+    # True if path still has the size and modification time (or the contents)
+    # recorded at time written. The contents are checked when the time differs
+    # or when the file was modified less than a second before it was recorded
+    # (the time may be in whole seconds so a change right after wouldn't show)
+    info = os.stat(path)
+    if size != info.st_size: return False
+    return (mtime == info.st_mtime and mtime < written - 1) or hash == fileHash(path)
+
+def recordAgain(info, mtime, written):
+    # True if the size, time and hash of a file that sameFile found unchanged
+    # (info is its os.stat) should be recorded again so it isn't hashed next time
+    return mtime != info.st_mtime or mtime >= written - 1
+
+def atomicWrite(path, write):
+    # write(f) writes the file at path to the open file f, it's written to a
+    # temporary file that is renamed to path when it's done so a partly written
+    # file is never read. Returns False if the file couldn't be written
+    try:
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder): os.makedirs(folder)
+        tmp = path+'.%d.tmp' % os.getpid()
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.rename(tmp, path)
+        return True
+    except (IOError, OSError):
+        return False
+
+def writeCache(cache, table, info, hash):
+    # write table (a dict of numpy arrays) to the cache file with the size, modification
+    # time (from info) and hash of the file it was read from and the time it's written.
+    # Object arrays are stored as strings. (reading still works if the cache can't be written)
+    arrays = {k: (np.array(v.tolist(), dtype = str) if v.dtype == object else v) for k,v in table.items()}
+    arrays.update({'size': info.st_size, 'mtime': info.st_mtime, 'hash': hash, 'written': time.time(),
+                   'objects': np.array([k for k,v in table.items() if v.dtype == object]+[''], dtype = str)})
+    atomicWrite(cache, lambda f: np.savez(f, **arrays))
+
+def readCached(path, key, cacheDir, reader):
+    # returns reader(path) (a dict of numpy arrays) but reuses the table from
+    # the last time the file was read if it hasn't changed since then (same
+    # size and modification time or same contents) and writes a new cache file
+    # otherwise
+    cache = cacheFile(path, key, cacheDir)
+    info = os.stat(path)
+    if isfile(cache):
+        try:
+            cached = np.load(cache)
+            mtime, hash, written = float(cached['mtime']), str(cached['hash']), float(cached['written'])
+            if sameFile(path, cached['size'], mtime, hash, written):
+                objects = set(cached['objects'].tolist())
+                table = {}
+                for k in cached.files:
+                    if k in ('size', 'mtime', 'hash', 'written', 'objects'): continue
+                    table[k] = np.array(cached[k].tolist(), dtype = object) if k in objects else cached[k]
+                cached.close()
+                if recordAgain(info, mtime, written): # eg. touched or copied, saved so it isn't hashed again
+                    writeCache(cache, table, info, hash)
+                return table
+            cached.close()
+        except Exception:
+            pass # unreadable cache files are rewritten
+    table = reader(path)
+    if table is None:
+        return None
+    writeCache(cache, table, info, fileHash(path))
+    return table
@@ -0,0 +1,103 @@
+#timing of the parts of plotmish (handling events, finding the vowels to
+#display, drawing the screen, reading files, praat and sox) to find out
+#what makes it slow. Nothing is timed until it's turned on (control+T in
+#plotmish): then the time of the last frames is shown on the screen and
+#every timed part is written to a trace file in the chrome trace event
+#format (open it in chrome://tracing or ui.perfetto.dev). The trace file
+#is written as the parts are timed so it can be read even if plotmish
+#doesn't quit normally
+import os, time, json, collections
+from contextlib import contextmanager
+from os.path import isdir, join
+
+class PerfTrace(object):
+    def __init__(self, folder, frames = 100):
+        self.folder = folder # folder the trace files are written to
+        self.on = False
+        self.file = None
+        self.path = None # trace file being written
+        self.frames = collections.deque(maxlen = frames) # seconds each of the last frames took
+        self.phases = collections.OrderedDict() # name -> seconds it took in each of the last frames
+        self.frameTimes = {} # name -> seconds it has taken in the current frame
+        self.pending = [] # trace events not written to the file yet
+        self.sent = {} # name -> start time of things that finish later (see since)
+
+    def toggle(self):
+        # start timing (and writing a new trace file) or stop, returns the path of the trace file
+        if self.on:
+            self.stop()
+            return self.path
+        if not isdir(self.folder): os.makedirs(self.folder)
+        self.path = join(self.folder, 'trace-%s.json' % time.strftime('%Y%m%d-%H%M%S'))
+        self.file = open(self.path, 'wb')
+        self.file.write('[\n') # (the closing bracket is optional in the trace event format)
+        self.frames.clear()
+        self.phases.clear()
+        self.frameTimes = {}
+        self.sent = {}
+        self.on = True
+        return self.path
+
+    def stop(self):
+        if not self.on: return
+        self.flush()
+        self.file.write('{}]\n')
+        self.file.close()
+        self.file = None
+        self.on = False
+
+    def add(self, name, start, seconds, thread = 0, **info):
+        # add something that started at start (time.time()) and took seconds to the trace
+        if not self.on: return
+        self.pending.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': thread, 'ts': int(start*1e6), 'dur': int(seconds*1e6), 'args': info})
+        self.frameTimes[name] = self.frameTimes.get(name, 0) + seconds
+
+    @contextmanager
+    def timed(self, name, **info):
+        # time the code in a with block (as name, info is written to the trace with it)
+        if not self.on:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time() - start, **info)
+
+    def send(self, name):
+        # something (eg. a praat measurement) was started that will finish in a later frame
+        if self.on: self.sent[name] = time.time()
+
+    def since(self, name):
+        # the thing started by send(name) has finished
+        start = self.sent.pop(name, None)
+        if start is not None: self.add(name, start, time.time() - start, thread = 1)
+
+    def frame(self, start):
+        # a frame that started at start has finished (its parts are written to the trace file)
+        if not self.on: return
+        seconds = time.time() - start
+        self.add('frame', start, seconds)
+        self.frames.append(seconds)
+        for name in self.frameTimes:
+            if name not in self.phases: self.phases[name] = collections.deque(maxlen = self.frames.maxlen)
+        for name,times in self.phases.items():
+            times.append(self.frameTimes.get(name, 0))
+        self.frameTimes = {}
+        self.flush()
+
+    def flush(self):
+        for event in self.pending:
+            self.file.write(json.dumps(event) + ',\n')
+        self.file.flush()
+        self.pending = []
+
+    def summary(self):
+        # lines of text with the frame time stats (in milliseconds) of the last frames
+        if not self.frames: return ('timing...',)
+        frames = sorted(self.frames)
+        lines = ['frame ms: mean %.1f  95%% %.1f  max %.1f  (%d frames)' % (1000*sum(frames)/len(frames), 1000*frames[int(0.95*(len(frames)-1))], 1000*frames[-1], len(frames))]
+        for name,times in self.phases.items():
+            if name == 'frame' or not any(times): continue
+            lines.append('%s ms: mean %.1f  max %.1f  last %.1f' % (name, 1000*sum(times)/len(times), 1000*max(times), 1000*times[-1]))
+        return tuple(lines)
@@ -0,0 +1,57 @@
+#reads pitch tracks saved by praat (as text files, see getPitch.praat)
+#into arrays of the best candidate frequency for each frame so that
+#the pitch of every vowel token can be looked up at once
+import numpy as np
+import parseCache
+
+def readPitchFile(pitchFile):
+    # reads a praat .Pitch text file into a table (dict of numpy arrays) with the
+    # time of the first frame (x1), time step (dx), pitch ceiling and the frequency
+    # of the first candidate of each frame (frequency[0] is frame [1])
+    header = {}
+    frequency = None
+    frame = None
+    firstCandidate = False
+    pitchF = open(pitchFile,'rU')
+    for line in pitchF:
+        line = line.strip()
+        if frequency is None:
+            # read the header up to the first frame
+            if '=' in line:
+                name, value = [l.strip() for l in line.split('=',1)]
+                if name in ('dx', 'x1', 'ceiling', 'nx') and name not in header:
+                    header[name] = float(value)
+            if line.startswith('frame ['):
+                frequency = np.zeros(int(header['nx']))
+            else: continue
+        if line.startswith('frame [') and not line.startswith('frame []'):
+            frame = int(line[7:line.index(']')])-1
+            firstCandidate = False
+        elif line.startswith('candidate [1]'):
+            firstCandidate = True
+        elif firstCandidate and line.startswith('frequency'):
+            frequency[frame] = float(line.split('=')[1].strip())
+            firstCandidate = False
+    pitchF.close()
+    if frequency is None:
+        frequency = np.zeros(0)
+    return {'x1': np.float64(header.get('x1', 0)), 'dx': np.float64(header.get('dx', 1)),
+            'ceiling': np.float64(header.get('ceiling', np.inf)), 'frequency': frequency}
+
+def readCachedPitchFile(pitchFile, cacheDir):
+    # same as readPitchFile but only reads the file again if it
+    # has changed since the last time (see parseCache.readCached)
+    return parseCache.readCached(pitchFile, 'pitch', cacheDir, readPitchFile)
+
+def pitchAt(track, times):
+    # returns the pitch (Hz) at each time in times (nan if not found or unvoiced)
+    # uses the frame whose number is the number of time steps from the first frame
+    times = np.asarray(times, dtype = np.float64)
+    frames = ((times - track['x1'])/track['dx']).astype(np.int64)
+    frequency = track['frequency']
+    pitch = np.empty(len(times))
+    pitch[:] = np.nan
+    found = (frames >= 1) & (frames <= len(frequency))
+    f = frequency[frames[found]-1]
+    pitch[found] = np.where((f != 0) & (f < track['ceiling']), f, np.nan)
+    return pitch
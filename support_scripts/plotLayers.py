@@ -0,0 +1,24 @@
+#cached surfaces for the parts of the plotmish window that don't change
+#every frame (the grid and axes of the plot, the vowel tokens, the vowel
+#info panel). Each layer has a key made of the state it is drawn from and
+#is only redrawn when that key changes, otherwise the saved surface is
+#blitted to the screen as it is
+import pygame
+
+class Layer(object):
+    def __init__(self):
+        self.key = None
+        self.surface = None
+
+    def get(self, key, size, draw):
+        # returns the surface of the layer, draw(surface) is called to redraw
+        # it if key (compared with ==) or size has changed since the last call
+        size = tuple(size)
+        if self.surface is None or self.surface.get_size() != size:
+            self.surface = pygame.Surface(size)
+            if pygame.display.get_surface(): self.surface = self.surface.convert()
+            self.key = None
+        if self.key is None or key != self.key:
+            draw(self.surface)
+            self.key = key
+        return self.surface
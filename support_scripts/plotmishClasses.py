@@ -1,61 +1,67 @@
-# vowel token class
-class vowel:
-    def __init__(self, f1, f2, wfile):
-        self.name = ''
-        self.F1 = f1
-        self.F2 = f2
-        self.wFile = wfile
-        self.stress = None
-        self.duration = None
-        self.word = ''
-        self.time = None
-        self.altVow = ''
-        self.pPhone = ''
-        self.fPhone = ''
-        self.maxForm = ''
-        self.timeRange = ()
-        self.durForms = []
-        self.numForms = []
-        self.pitch = None
-        self.button = None
-        self.origButton = None
-        self.alreadyCorrected = None
-        self.id = None
-        self.remeasureOpts = ['praat'] 
+def storeValue(name):
+    # property reading a vowel attribute from the token store
+    # (or from the view itself if it has been changed)
+    def get(self):
+        if self.over and name in self.over:
+            return self.over[name]
+        return self.store.value(name, self.index)
+    def set(self, value):
+        if self.over is None: self.over = {}
+        self.over[name] = value
+    return property(get, set)
+
+# lightweight vowel token that reads its values from a
+# row in a tokenStore.TokenStore (one for every vowel token loaded)
+class vowelView(object):
+    __slots__ = ('store', 'index', 'button')
+    origButton = None # button of the vowel an alternate measurement was made from
+    over = None # values that differ from the token store (only alternates have them)
+
+    def __init__(self, store, index, button = None):
+        self.store = store
+        self.index = index # row in the token store
+        self.button = button
+
+    name = storeValue('name')
+    F1 = storeValue('F1')
+    F2 = storeValue('F2')
+    wFile = storeValue('wFile')
+    stress = storeValue('stress')
+    duration = storeValue('duration')
+    word = storeValue('word')
+    time = storeValue('time')
+    altVow = storeValue('altVow')
+    pPhone = storeValue('pPhone')
+    fPhone = storeValue('fPhone')
+    maxForm = storeValue('maxForm')
+    timeRange = storeValue('timeRange')
+    durForms = storeValue('durForms')
+    numForms = storeValue('numForms')
+    pitch = storeValue('pitch')
+    alreadyCorrected = storeValue('alreadyCorrected')
+    id = storeValue('id')
+    remeasureOpts = storeValue('remeasureOpts')
 
     def makeAlternate(self, f1, f2, newButton):
-        # makes identical version of vowel with different f1 and 
+        # makes a view of the same token with different f1 and
         # f2 and button
-        newV = vowel(f1,f2, self.wFile)
-        newV.name = self.name
-        newV.stress = self.stress
-        newV.duration = self.duration
-        newV.word = self.word
-        newV.time = self.time
-        newV.altVow = self.altVow
-        newV.pPhone = self.pPhone
-        newV.fPhone = self.fPhone
-        newV.maxForm = self.maxForm
-        newV.durForms = self.durForms
-        newV.numForms = self.numForms
-        newV.timeRange = self.timeRange
-        newV.pitch = self.pitch
-        newV.id = self.id
-        newV.F1 = f1
-        newV.F2 = f2
-        newV.origButton = self.button
-        newV.button = newButton
-        newV.remeasureOpts = self.remeasureOpts 
-        return newV
+        return alternateView(self, f1, f2, newButton)
 
-    def inPlot(self, plot):
-        # returns bool whether button is in the current plot
-        under = self.button.rect.center[1] > 10 
-        over = self.button.rect.center[1] < plot.height
-        right_of = self.button.rect.center[0] > 10
-        left_of = self.button.rect.center[0] < plot.width
-        
-        return under and over and right_of and left_of  
+    def commit(self):
+        # writes the changed values of an alternate to a new row
+        # in the token store and returns a view of that row
+        changes = {k:v for k,v in (self.over or {}).items() if k in ('F1','F2','time','maxForm','pitch')}
+        return vowelView(self.store, self.store.append(self.index, **changes), self.button)
+
+# alternate measurement of a vowel token (a view of the same row with its own
+# values for the measurements that changed, see vowelView.commit)
+class alternateView(vowelView):
+    __slots__ = ('origButton', 'over')
+
+    def __init__(self, orig, f1, f2, button):
+        vowelView.__init__(self, orig.store, orig.index, button)
+        self.origButton = orig.button
+        self.over = {'F1': f1, 'F2': f2}
 
 # placeholder class for vowel plot
 class vowelPlot:
@@ -65,7 +71,8 @@ class vowelPlot:
         self.xFormButtons = [] # list to write the alternate measurements to (when re-evaluating a vowel)
         self.currentVowel = None # current vowel button (last scrolled over)
         self.oldv = None # when remeasuring a vowel this stores the old values 
-        self.ellip = [] # list to write ellipse variables (from output of confidenceEllipse())
+        self.ellip = [] # list of (colour, outline points) of the confidence ellipses to draw (from updateEllipses())
+        self.density = None # density map drawn instead of the vowels when there are too many (from updateDensity())
         self.filtered = [] # list of vowels filtered by duration or orthography
         self.minDur = None # minimum duration of vowels to be displayed (None means minimum duration is 0)
         self.filtWrd = None # word to filter from the plot (None means display all vowels)
@@ -75,6 +82,8 @@ class vowelPlot:
         self.altDisplayed = [] # list of celex vowels to display on plot
         self.remReason = '' # vowel removal mode: either 'BAD' or 'OK'
         self.vowButtons = [] # list of all buttons that have not been removed
+        self.store = None # tokenStore.TokenStore holding all vowel tokens
+        self.layout = None # tokenLayer.Layout with the screen location of each vowel in store
         self.height = 600 # height of the plot
         self.width = 700 # width of the plot
         self.maxF1 = None 
@@ -85,6 +94,17 @@ class vowelPlot:
         self.defaultMaxMin = () # default of self.maxMin (does not change when zooming)
         self.allLogs = {} # dictionary of all changes made since last save
 
+# placeholder class for a speaker (wav file) in speaker mode
+class Speaker:
+    def __init__(self, files):
+        self.files = files # (wav file, formant.txt file)
+        self.store = None # token store (None if not loaded)
+        self.vowButtons = None # vowels that have not been removed (None if not loaded)
+        self.layout = None # screen locations of the vowels in store
+        self.defaultMaxMin = () # (minF1, minF2, maxF1, maxF2) of this speaker's vowels
+        self.lastUsed = 0 # last time this speaker was displayed
+        self.resumed = False # apply the changes in the log file when loading
+
 # placeholder class for plotmish settings
 class Settings:
     def __init__(self):
@@ -94,6 +114,8 @@ class Settings:
         self.play = False # indicates whether play button in on or off
         self.zooming = False # whether zoom button is on or off (and zoom mode is on)
         self.stdDevCounter = 0 #counter for drawing different ellipse sizes
+        self.classEllipses = False # draw an ellipse for each vowel class instead of one for all vowels displayed
+        self.ellipses = None # ellipses.EllipseCache of the mean and covariance of the vowels displayed
         self.formType = 'dur' # remeasure mode (either 'dur' or 'num')
         self.praatMode = True # true if remeasure mode is praat (button caption is remeasureP)
         self.vowelMode = 'union' # vowel display mode: union or intersect of vowels in arpDisplayed and altDisplayed
@@ -101,12 +123,22 @@ class Settings:
         self.praatInfo = [] # list to write info from praatlog
         self.lastVowel = None # last vowel measured (for used with "check last" button)
         self.vowList = [] # list to write vowel that are currently displayed
-        self.displayMemory = [] # list of all vowel plots up to the last save
-        self.logMemory = [] # list of all log dicts up to the last save
+        self.visibility = None # visibility.Visibility that decides which vowels are in vowList
+        self.density = None # density.DensityMap of the vowels in vowList
+        self.tokenGrid = None # tokenGrid.TokenGrid of the vowels in vowList (to find the vowels under the mouse)
+        self.gridChange = True # set to True when tokenGrid has to be rebuilt
+        self.candidateGrid = None # tokenGrid.TokenGrid of the alternate measurement buttons
+        self.layers = {} # plotLayers.Layer of each part of the screen that is cached between frames
+        self.overlays = None # zoom lines and alternate measurement buttons last drawn over the vowel plot
+        self.journal = None # undoJournal.UndoJournal of the changes made since the last save
+        self.corrections = None # correctionJournal.CorrectionJournal the changes are written to as they are made
         self.praatLog = None # set path of praatlog file (location of output of praat)     
+        self.praatWatch = None # fileWatch.FileWatch posting an event when praat writes the praatlog file
         self.permButtons = [] # make permanent buttons (vowel buttons, display all/none buttons)
         self.permDisplay = [] #put all permanent buttons in a list so they can be displayed
         self.files = []
+        self.speakers = [] # list of plotmishClasses.Speaker (speaker mode only)
+        self.speaker = None # index of the speaker currently displayed (speaker mode only)
         self.FPS = 10 
         self.F1,self.F2 = None, None
         self.arpLabel = None
@@ -0,0 +1,63 @@
+#uniform grid over the screen positions of the vowel tokens displayed
+#on the plot so the tokens under the mouse can be found by looking in a
+#few grid cells instead of checking every token on the screen
+import numpy as np
+import tokenLayer
+from pygame.locals import MOUSEMOTION, MOUSEBUTTONUP, MOUSEBUTTONDOWN
+
+# offset so grid cells left of or above the plot still have positive keys
+cellOffset = 1 << 20
+
+def cellKey(cx, cy):
+    # single integer key for the grid cell (cx, cy)
+    return (cx + cellOffset)*(cellOffset << 1) + (cy + cellOffset)
+
+class TokenGrid(object):
+    # grid of tokens (vowel views with tokenLayer.TokenMark buttons) in the order they are displayed
+    # keeps track of the tokens the mouse is over and the tokens the mouse was
+    # pressed down on (like PygButton.handleEvent does for a single button)
+    def __init__(self, tokens, old = None):
+        self.tokens = list(tokens)
+        self.visible = set(tokens)
+        # tokens the mouse is over (kept from the old grid so moving the mouse
+        # doesn't enter a token again just because the grid was rebuilt)
+        self.hovered = old.hovered if old else set()
+        self.pressed = old.pressed if old else set()
+        self.rects = tokenLayer.markRects([t.button for t in self.tokens])
+        # cells are at least as big as the tokens so a token can only
+        # overlap the cell it starts in and the next cells right and down
+        self.cell = int(max(1, self.rects[:,2:].max())) if len(tokens) else 1
+        keys = cellKey(self.rects[:,0]//self.cell, self.rects[:,1]//self.cell)
+        self.order = np.argsort(keys, kind = 'mergesort')
+        self.keys = keys[self.order]
+
+    def at(self, pos):
+        # returns the tokens whose rect contains pos (in display order)
+        x, y = pos
+        cx, cy = x//self.cell, y//self.cell
+        found = []
+        for kx in (cx-1, cx):
+            for ky in (cy-1, cy):
+                k = cellKey(kx, ky)
+                lo, hi = np.searchsorted(self.keys, [k, k+1])
+                found += self.order[lo:hi].tolist()
+        r = self.rects
+        return [self.tokens[i] for i in sorted(found) if r[i,0] <= x < r[i,0]+r[i,2] and r[i,1] <= y < r[i,1]+r[i,3]]
+
+    def handleEvent(self, event):
+        # returns (tokens the mouse entered, tokens clicked) for a pygame event
+        # a token is clicked if the mouse was pressed and released over it
+        if event.type not in (MOUSEMOTION, MOUSEBUTTONUP, MOUSEBUTTONDOWN):
+            return [], []
+        hits = self.at(event.pos)
+        entered = [t for t in hits if t not in self.hovered]
+        # only tokens on the screen can be left (like buttons that aren't drawn)
+        self.hovered.difference_update([t for t in self.hovered if t in self.visible])
+        self.hovered.update(hits)
+        clicked = []
+        if event.type == MOUSEBUTTONDOWN:
+            self.pressed = set(hits)
+        elif event.type == MOUSEBUTTONUP:
+            clicked = [t for t in hits if t in self.pressed]
+            self.pressed = set()
+        return entered, clicked
@@ -0,0 +1,137 @@
+#draws the vowel tokens on the plot. Tokens don't have their own surfaces
+#(like a pygbutton.PygButton does), each token only has a TokenMark with
+#its caption and colours. One glyph is rendered for each caption, colour
+#and size and shared by all tokens that look the same, so all the tokens
+#on the screen can be drawn with a single blits call.
+#The screen locations of the vowels in a token store are kept in a Layout
+#as arrays that are calculated all at once when zooming or resizing
+import pygame
+import numpy as np
+from pygbutton import PYGBUTTON_FONT
+
+glyphs = {} # (caption, bgcolor, fgcolor, size) -> rendered glyph
+
+def glyph(caption, bgcolor, fgcolor, size):
+    # returns the surface for a token (rendered the same way
+    # as a PygButton without a border)
+    key = (caption, tuple(bgcolor), tuple(fgcolor), size)
+    try:
+        return glyphs[key]
+    except KeyError:
+        pass
+    surf = pygame.Surface(size, 0, 32) # (not the palette of a surface made without a display)
+    surf.fill(bgcolor)
+    captionSurf = PYGBUTTON_FONT.render(caption, True, fgcolor, bgcolor)
+    captionRect = captionSurf.get_rect()
+    captionRect.center = int(size[0] / 2), int(size[1] / 2)
+    surf.blit(captionSurf, captionRect)
+    if pygame.display.get_surface(): surf = surf.convert() # faster to blit to the screen
+    glyphs[key] = surf
+    return surf
+
+class Layout(object):
+    # screen locations of the rows of a token store
+    # locate(F1, F2, transform) returns the (x, y) location of arrays of F1 and
+    # F2 values, transform is whatever locate needs to know about the zoom and
+    # window size (it is only compared with == to see if it has changed)
+    def __init__(self, store, locate, size):
+        self.store = store
+        self.locate = locate
+        self.transform = None
+        self.size = size # size of the vowel tokens (unless a mark has its own size)
+        self.sized = [] # marks placed here with their own size
+        self.centers = np.zeros((0,2), dtype = np.int64)
+
+    def setTransform(self, transform):
+        # move all vowels (their locations are calculated the next time they are needed)
+        if transform != self.transform:
+            self.transform = transform
+            self.centers = self.centers[:0]
+
+    def resize(self, size):
+        # change the size of all vowel tokens
+        self.size = size
+        for m in self.sized:
+            m.size = None
+        self.sized = []
+
+    def locations(self):
+        # returns the centre of each row on the screen as an (n,2) array
+        # (rows added to the store since the last call are located as well)
+        done, n = len(self.centers), len(self.store)
+        if done < n:
+            x, y = self.locate(self.store['F1'][done:], self.store['F2'][done:], self.transform)
+            new = np.empty((n-done, 2), dtype = np.int64)
+            new[:,0] = np.trunc(x) # truncated like the coordinates of a pygame.Rect
+            new[:,1] = np.trunc(y)
+            self.centers = np.concatenate((self.centers, new))
+        return self.centers
+
+class TokenMark(object):
+    # where and how a vowel token is drawn on the plot (stands in for the
+    # PygButton of each token, the glyph is only looked up when drawn).
+    # A mark is either drawn at a fixed rect or at the location of a row
+    # of a token store in a Layout (see place)
+    __slots__ = ('caption', 'bgcolor', 'fgcolor', 'size', 'fixed', 'layout', 'row')
+
+    def __init__(self, rect, caption, bgcolor, fgcolor):
+        self.fixed = pygame.Rect(rect) if rect is not None else None
+        self.size = self.fixed.size if rect is not None else None
+        self.caption = caption
+        self.bgcolor = bgcolor
+        self.fgcolor = fgcolor
+        self.layout = None
+        self.row = None
+
+    def place(self, layout, row, size = None):
+        # draw the mark at the location of row in layout (at the size of
+        # the layout's tokens unless size is given)
+        self.layout = layout
+        self.row = row
+        self.size = size
+        if size is not None: layout.sized.append(self)
+
+    def tokenSize(self):
+        return self.size or self.layout.size
+
+    @property
+    def rect(self):
+        # rect the mark is drawn in (a new Rect if the mark is placed in a layout)
+        if self.layout is None:
+            return self.fixed
+        w, h = self.tokenSize()
+        cx, cy = self.layout.locations()[self.row]
+        return pygame.Rect(int(cx) - w//2, int(cy) - h//2, w, h)
+
+    def surface(self):
+        return glyph(self.caption, self.bgcolor, self.fgcolor, self.tokenSize())
+
+    def draw(self, surfaceObj):
+        surfaceObj.blit(self.surface(), self.rect)
+
+def markRects(marks):
+    # returns the rects of marks as an (n,4) array of (left, top, width, height)
+    rects = np.zeros((len(marks), 4), dtype = np.int64)
+    placed = {} # layout -> ([index in marks], [row], [size])
+    for i,m in enumerate(marks):
+        if m.layout is None:
+            rects[i] = tuple(m.fixed)
+        else:
+            idx, rows, sizes = placed.setdefault(m.layout, ([], [], []))
+            idx.append(i)
+            rows.append(m.row)
+            sizes.append(m.size or m.layout.size)
+    for layout,(idx, rows, sizes) in placed.items():
+        sizes = np.array(sizes, dtype = np.int64)
+        rects[idx,2:] = sizes
+        rects[idx,:2] = layout.locations()[rows] - sizes//2
+    return rects
+
+def drawTokens(surfaceObj, marks):
+    # draw all marks (in order) to the surface at once
+    blits = zip([m.surface() for m in marks], markRects(marks)[:,:2].tolist())
+    if hasattr(surfaceObj, 'blits'):
+        surfaceObj.blits(blits, False)
+    else: # pygame older than 1.9.4
+        for s,r in blits:
+            surfaceObj.blit(s, r)
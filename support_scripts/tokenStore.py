@@ -0,0 +1,265 @@
+#columnar storage for vowel tokens
+#every token read from a formant.txt file is a row in a TokenStore
+#numeric values are kept in numpy arrays and repeated strings
+#(vowel codes, words, phones...) are kept as integer codes into
+#a shared vocabulary list so large corpora can be held in memory
+import re
+from os.path import basename
+import numpy as np
+import parseCache
+
+# lists of headings from the config file
+mandatoryHeadings  = ['ARPABET','STRESS', 'WORD', 'F1', 'TIME', 'WORD PRONUNCIATION', 'MAX FORMANTS', 'BEGINNING', 'END', 'INDEX']
+durHeadings = ['F1@20%', 'F2@20%' ,'F1@35%' , 'F2@35%' , 'F1@50%' , 'F2@50%' , 'F1@65%' , 'F2@65%' , 'F1@80%' , 'F2@80%']
+optionalHeadings = ['DURATION', 'PRECEDING PHONE', 'FOLLOWING PHONE', 'CELEX', 'ALT MEASUREMENTS']
+
+# columns holding strings (stored as codes + vocabulary)
+categoryColumns = ('name', 'word', 'pPhone', 'fPhone', 'pron', 'stress', 'maxForm', 'altVow')
+
+# numeric columns and their types (shape is the shape of a single row)
+numericColumns = {'F1': (np.float64, ()),
+                  'F2': (np.float64, ()),
+                  'time': (np.float64, ()),
+                  'beg': (np.float64, ()),
+                  'end': (np.float64, ()),
+                  'dur': (np.float64, ()),   # seconds (nan if no DURATION column)
+                  'pitch': (np.float64, ()), # Hz (nan if not found)
+                  'durForms': (np.float64, (5,2)), # (F1,F2) at 20,35,50,65,80% of the duration
+                  'numForms': (np.float64, (4,2)), # (F1,F2) at 3,4,5,6 max formants
+                  'nDur': (np.int8, ()),     # number of valid durForms
+                  'nNum': (np.int8, ()),     # number of valid numForms
+                  'num': (np.int32, ()),     # row number in the formant.txt file (starting at 1)
+                  'index': (np.int16, ()),   # index of the vowel in the word pronunciation
+                  'fileIdx': (np.int32, ()), # index of the wav file in TokenStore.files
+                  'timeDigits': (np.int8, (3,))} # decimal places of time, beg and end in the file (see decimals)
+
+def formatDecimal(value, places):
+    # value as a string with places decimal places (or as str(value) if places is -1)
+    return '%.*f' % (int(places), value) if places >= 0 else str(float(value))
+
+def decimals(text):
+    # decimal places of a number read from a file so it can be written back
+    # the same way (eg. 1.2300 not 1.23), -1 if it isn't a plain decimal number
+    text = text.strip()
+    places = len(text) - text.index('.') - 1 if '.' in text else 0
+    return places if formatDecimal(float(text), places) == text else -1
+
+def encode(values):
+    # returns (codes, vocabulary) for a list of strings
+    vocab = {}
+    codes = np.empty(len(values), dtype = np.int32)
+    for i,v in enumerate(values):
+        codes[i] = vocab.setdefault(v, len(vocab))
+    vocabList = [None]*len(vocab)
+    for v,c in vocab.items():
+        vocabList[c] = v
+    return codes, np.array(vocabList, dtype = object)
+
+def readFormantFile(formantFile, headings):
+    # reads a formant.txt file into a table (dict of numpy arrays)
+    # headings is the heading map from the config.txt file
+    # returns None if the mandatory headings are not found
+    revHeadings = {v:k for k,v in headings.items()}
+    vowelF = open(formantFile,'r')
+    vowels = vowelF.readlines()
+    vowelF.close()
+    # find header line and column indexes
+    indexes = {i: None for i in mandatoryHeadings+durHeadings+optionalHeadings}
+    badFile = True
+    for i,line in enumerate(vowels):
+        headCount = 0
+        for head in mandatoryHeadings:
+            if headings[head] in line: headCount += 1
+        if headCount == len(mandatoryHeadings):
+            for j,l in enumerate(line.split('\t')):
+                try: indexes[revHeadings[l]] = j
+                except: pass
+            badFile = False
+            vowels = vowels[i+1:]
+            break
+    if badFile:
+        return None
+    n = len(vowels)
+    table = {c: np.zeros((n,)+s, dtype = t) for c,(t,s) in numericColumns.items()}
+    table['durForms'][:] = np.nan
+    table['numForms'][:] = np.nan
+    table['pitch'][:] = np.nan
+    text = {c: [] for c in categoryColumns if c != 'altVow'}
+    celex = []
+    for i,v in enumerate(vowels):
+        v = v.split('\t')
+        table['F1'][i] = float(v[indexes['F1']])
+        table['F2'][i] = float(v[indexes['F2']])
+        table['num'][i] = i+1
+        # get other formant measurements from various points in the vowel duration
+        # (F1@20%, F2@20%, F1@35%, F2@35%, F1@50%, F2@50%, F1@65%, F2@65%, F1@80%, F2@80%)
+        if None not in [indexes[h] for h in durHeadings]:
+            nDur = 0
+            for j in range(0,len(durHeadings),2):
+                try:
+                    table['durForms'][i,nDur] = (round(float(v[indexes[durHeadings[j]]]),1),round(float(v[indexes[durHeadings[j+1]]]),1))
+                    nDur += 1
+                except: continue
+            table['nDur'][i] = nDur
+        # get other formant measurements from the same point with various max Formant settings (3,4,5,6)
+        if indexes['ALT MEASUREMENTS'] != None:
+            moreForms = [re.sub('[\[\]]','',m).split(',') for m in v[indexes['ALT MEASUREMENTS']].split('],[')]
+            nNum = 0
+            for m in moreForms:
+                try:
+                    temp = tuple([round(float(n.strip()),1) for n in m[:2]])
+                except:
+                    assert False, 'ERROR:\tthe formant.txt files do not contain extra formant measurement info\n\t\t\tmake sure the config.txt file in FAVE-extract has the line:\n\t\t\tcandidates=T\n\t\t\tand then re-extract the formant values'
+                if len(temp) != 2:
+                    continue
+                if nNum < 4: table['numForms'][i,nNum] = temp
+                nNum += 1
+            table['nNum'][i] = nNum
+        # get other values
+        text['pron'] += [' '.join([p.strip() for p in re.sub('[\[\]\']','',v[indexes['WORD PRONUNCIATION']]).split(',')])]
+        text['pPhone'] += [v[indexes['PRECEDING PHONE']] if indexes['PRECEDING PHONE'] != None else '??']
+        text['fPhone'] += [v[indexes['FOLLOWING PHONE']] if indexes['FOLLOWING PHONE'] != None else '??']
+        text['word'] += [v[indexes['WORD']]]
+        text['name'] += [v[indexes['ARPABET']]]
+        text['maxForm'] += [v[indexes['MAX FORMANTS']]]
+        text['stress'] += [v[indexes['STRESS']]]
+        if indexes['CELEX'] != None: celex += [v[indexes['CELEX']]]
+        table['index'][i] = int(v[indexes['INDEX']])
+        table['time'][i] = float(v[indexes['TIME']])
+        table['beg'][i] = float(v[indexes['BEGINNING']])
+        table['end'][i] = float(v[indexes['END']])
+        table['timeDigits'][i] = [decimals(v[indexes[h]]) for h in ('TIME', 'BEGINNING', 'END')]
+        table['dur'][i] = float(v[indexes['DURATION']]) if indexes['DURATION'] != None else np.nan
+    for c,values in text.items():
+        table[c], table[c+'Vocab'] = encode(values)
+    if indexes['CELEX'] != None:
+        table['altVow'], table['altVowVocab'] = encode(celex)
+    return table
+
+def readCachedFormantFile(formantFile, headings, cacheDir):
+    # same as readFormantFile but only reads the file again if it
+    # has changed since the last time (see parseCache.readCached)
+    return parseCache.readCached(formantFile, ('formant', sorted(headings.items())), cacheDir, lambda f: readFormantFile(f, headings))
+
+
+class TokenStore(object):
+    # all vowel tokens currently loaded in plotmish
+    def __init__(self):
+        self.files = [] # wav file for each file index
+        self.n = 0 # number of rows
+        self.cols = {c: np.zeros((0,)+s, dtype = t) for c,(t,s) in numericColumns.items()}
+        for c in categoryColumns:
+            self.cols[c] = np.zeros(0, dtype = np.int32)
+        self.vocab = {c: [] for c in categoryColumns} # code -> string
+        self.codes = {c: {} for c in categoryColumns} # string -> code
+        self.corrections = {} # row -> already corrected values from log file (or 'removed')
+        self.hasPitch = False # True if pitch values were read for these tokens
+
+    def __len__(self):
+        return self.n
+
+    def nbytes(self):
+        # memory used by the columns of the store
+        return sum([c.nbytes for c in self.cols.values()])
+
+    def __getitem__(self, column):
+        # returns the values of a column for all rows
+        return self.cols[column][:self.n]
+
+    def code(self, column, value):
+        # returns the code for a string in a category column (adds it if it's new)
+        try:
+            return self.codes[column][value]
+        except KeyError:
+            self.codes[column][value] = len(self.vocab[column])
+            self.vocab[column].append(value)
+            return self.codes[column][value]
+
+    def strings(self, column, rows = None):
+        # returns a numpy array of the strings in a category column
+        vocab = np.array(self.vocab[column], dtype = object)
+        codes = self[column] if rows is None else self[column][rows]
+        return vocab[codes]
+
+    def _reserve(self, extra):
+        # make sure there is room for extra rows in every column
+        cap = len(self.cols['F1'])
+        if self.n + extra <= cap: return
+        newCap = max(self.n + extra, int(cap*1.5))
+        for c,col in self.cols.items():
+            newCol = np.zeros((newCap,)+col.shape[1:], dtype = col.dtype)
+            newCol[:self.n] = col[:self.n]
+            self.cols[c] = newCol
+
+    def extend(self, wFile, table):
+        # add all rows of a table (output of readFormantFile) read from the
+        # formant.txt file corresponding to wFile, returns the new rows as a slice
+        k = len(table['F1'])
+        start = self.n
+        self._reserve(k)
+        self.files.append(wFile)
+        for c in numericColumns:
+            if c in table:
+                self.cols[c][start:start+k] = table[c]
+        for c in categoryColumns:
+            if c in table:
+                mapping = np.array([self.code(c, v) for v in table[c+'Vocab']], dtype = np.int32)
+                self.cols[c][start:start+k] = mapping[table[c]] if k else []
+            else:
+                self.cols[c][start:start+k] = self.code(c, '')
+        self.cols['fileIdx'][start:start+k] = len(self.files)-1
+        self.n += k
+        return slice(start, start+k)
+
+    def append(self, row, **changes):
+        # add a copy of row with changed values (F1, F2, time, maxForm or pitch)
+        # returns the index of the new row
+        self._reserve(1)
+        new = self.n
+        for c,col in self.cols.items():
+            col[new] = col[row]
+        for c,value in changes.items():
+            if c in ('F1', 'F2', 'time'):
+                self.cols[c][new] = float(value)
+                if c == 'time': self.cols['timeDigits'][new,0] = decimals(str(value))
+            elif c == 'maxForm':
+                self.cols[c][new] = self.code(c, str(value))
+            elif c == 'pitch':
+                try: self.cols[c][new] = float(value) if value != None else np.nan
+                except ValueError: self.cols[c][new] = np.nan
+        self.n += 1
+        return new
+
+    def value(self, column, i):
+        # returns the value of a single token in the format used by
+        # the rest of plotmish (ie. as the old vowel class attributes)
+        cols = self.cols
+        if column in ('F1', 'F2'):
+            return float(cols[column][i])
+        if column in categoryColumns:
+            return self.vocab[column][cols[column][i]]
+        if column == 'time':
+            return formatDecimal(cols['time'][i], cols['timeDigits'][i,0])
+        if column == 'duration':
+            d = cols['dur'][i]
+            return str(int(d*1000)) if not np.isnan(d) else '??'
+        if column == 'timeRange':
+            return (formatDecimal(cols['beg'][i], cols['timeDigits'][i,1]), formatDecimal(cols['end'][i], cols['timeDigits'][i,2]))
+        if column == 'pitch':
+            if not self.hasPitch: return None
+            p = cols['pitch'][i]
+            return str(int(p)) if not np.isnan(p) else 'Not Found'
+        if column == 'durForms':
+            return [tuple(f) for f in cols['durForms'][i].tolist() if not np.isnan(f[0])]
+        if column == 'numForms':
+            return [tuple(f) for f in cols['numForms'][i].tolist() if not np.isnan(f[0])]
+        if column == 'remeasureOpts':
+            return ['praat'] + (['dur'] if cols['nDur'][i] == 5 else []) + (['num'] if cols['nNum'][i] == 4 else [])
+        if column == 'wFile':
+            return self.files[cols['fileIdx'][i]]
+        if column == 'id':
+            wFile = self.files[cols['fileIdx'][i]]
+            return basename(wFile).replace('.wav','')+'-'+str(cols['num'][i])
+        if column == 'alreadyCorrected':
+            return self.corrections.get(i)
+        raise KeyError(column)
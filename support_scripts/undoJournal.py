@@ -0,0 +1,128 @@
+#undo/redo journal of the changes made to the vowels on the plot (vowels
+#removed, remeasured or resumed from the log file and the lines written to
+#the log). Only what each change did is kept instead of a copy of all the
+#vowels and logs, so undoing a change takes as long as the change itself.
+#The newest changes are kept in memory and older ones are written to a
+#temporary file until they are undone
+import cPickle, tempfile
+
+def removeAt(items, positions):
+    # returns items without the items at positions (ascending)
+    out, start = [], 0
+    for p in positions:
+        out.extend(items[start:p])
+        start = p + 1
+    out.extend(items[start:])
+    return out
+
+def insertAt(items, inserted):
+    # returns items with each (position, item) in inserted put at position
+    # (positions in the returned list, ascending)
+    out, start = [], 0
+    for p,item in inserted:
+        take = p - len(out)
+        out.extend(items[start:start+take])
+        start += take
+        out.append(item)
+    out.extend(items[start:])
+    return out
+
+class SpillStack(object):
+    # stack keeping the newest limit items in memory, older items are
+    # pickled to a temporary file (and read back when they are popped)
+    def __init__(self, limit):
+        self.limit = limit
+        self.items = []
+        self.offsets = [] # position in the file of each item written to it (oldest first)
+        self.file = None
+
+    def __len__(self):
+        return len(self.items) + len(self.offsets)
+
+    def push(self, item):
+        self.items.append(item)
+        if len(self.items) > self.limit:
+            if self.file is None: self.file = tempfile.TemporaryFile()
+            self.file.seek(0, 2)
+            self.offsets.append(self.file.tell())
+            cPickle.dump(self.items.pop(0), self.file, 2)
+
+    def pop(self):
+        # returns the newest item (None if there are none)
+        if not self.items and self.offsets:
+            offset = self.offsets.pop()
+            self.file.seek(offset)
+            item = cPickle.load(self.file)
+            self.file.truncate(offset)
+            return item
+        return self.items.pop() if self.items else None
+
+    def clear(self):
+        self.items, self.offsets = [], []
+        if self.file: self.file.close()
+        self.file = None
+
+class UndoJournal(object):
+    # a change is (removed, added, logs): removed and added are (position, token
+    # store row) of the vowels taken out of the list of vowels and put in it
+    # (positions in the list before and after the change) and logs are the
+    # (wav file, line) pairs written to the log dict
+    def __init__(self, limit = 50, record = None):
+        self.views = {} # token store row -> vowel of the vowels in the changes
+        self.record = record # told about every log line added (add(wav file, line)) or taken back (pop(wav file))
+        self.undos = SpillStack(limit)
+        self.redos = SpillStack(limit)
+
+    def clear(self):
+        # forget all changes (after saving or changing speakers)
+        self.views = {}
+        self.undos.clear()
+        self.redos.clear()
+
+    def apply(self, change, vowels, logs):
+        # returns vowels after the change (the log lines are added to logs)
+        removed, added, lines = change
+        vowels = removeAt(vowels, [p for p,r in removed])
+        vowels = insertAt(vowels, [(p, self.views[r]) for p,r in added])
+        for f,line in lines:
+            logs[f].append(line)
+            if self.record: self.record.add(f, line)
+        return vowels
+
+    def revert(self, change, vowels, logs):
+        # returns vowels before the change (the log lines are taken out of logs)
+        removed, added, lines = change
+        vowels = removeAt(vowels, [p for p,r in added])
+        vowels = insertAt(vowels, [(p, self.views[r]) for p,r in removed])
+        for f,line in reversed(lines):
+            logs[f].pop()
+            if self.record: self.record.pop(f)
+        return vowels
+
+    def change(self, vowels, logs, removed = (), added = (), lines = ()):
+        # returns vowels without the vowels in removed and with the vowels in added
+        # at the end, lines ((wav file, line) pairs) are added to logs. The change
+        # is recorded to be undone (changes that were undone can't be redone anymore)
+        gone = set(removed)
+        positions = [i for i,v in enumerate(vowels) if v in gone] if gone else []
+        self.views.update((v.index, v) for v in gone)
+        self.views.update((v.index, v) for v in added)
+        start = len(vowels) - len(positions)
+        change = ([(p, vowels[p].index) for p in positions], [(start + i, v.index) for i,v in enumerate(added)], list(lines))
+        self.undos.push(change)
+        self.redos.clear()
+        return self.apply(change, vowels, logs)
+
+    def undo(self, vowels, logs):
+        # returns vowels before the last change (vowels if there is nothing to undo)
+        change = self.undos.pop()
+        if change is None: return vowels
+        self.redos.push(change)
+        return self.revert(change, vowels, logs)
+
+    def redo(self, vowels, logs):
+        # returns vowels after the last change undone (vowels if there is nothing to redo)
+        change = self.redos.pop()
+        if change is None: return vowels
+        self.undos.push(change)
+        return self.apply(change, vowels, logs)
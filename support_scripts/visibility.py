@@ -0,0 +1,64 @@
+#decides which vowels are displayed on the plot. There is a boolean mask
+#over the vowels for each thing that decides it (arpabet vowels, celex
+#vowels, stress, filtered vowels and the part of the plot zoomed in on).
+#A mask is only made again when what it depends on changes and the
+#vowels displayed are found by combining the masks
+import numpy as np
+
+class Visibility(object):
+    def __init__(self):
+        self.tokens = [] # vowels to choose from (vowelViews in display order)
+        self.store = None # token store the vowels are from
+        self.rows = np.zeros(0, dtype = np.int64) # token store row of each vowel
+        self.keys = {} # mask name -> what the mask was made from
+        self.masks = {} # mask name -> boolean mask over self.tokens
+
+    def setTokens(self, tokens, store):
+        # set the vowels to choose from (all masks are made again if they have changed)
+        if store is self.store and len(tokens) == len(self.tokens) and tokens == self.tokens:
+            return
+        self.tokens = list(tokens)
+        self.store = store
+        self.rows = np.fromiter((t.index for t in self.tokens), dtype = np.int64, count = len(self.tokens))
+        self.keys = {}
+        self.masks = {}
+
+    def mask(self, name, key, make):
+        # returns the mask called name, make() is only called to make
+        # it again if key (compared with ==) has changed since last time
+        if name not in self.masks or self.keys[name] != key:
+            self.masks[name] = make()
+            self.keys[name] = key
+        return self.masks[name]
+
+    def inColumn(self, column, values):
+        # mask of the vowels with one of values in a token store column
+        wanted = np.array([v in values for v in self.store.vocab[column]], dtype = bool)
+        if not len(wanted): return np.zeros(len(self.tokens), dtype = bool)
+        return wanted[self.store[column][self.rows]]
+
+    def inPlot(self, plot):
+        # mask of the vowels whose location in plot.layout is inside the plot area
+        x, y = plot.layout.locations()[self.rows].T
+        return (y > 10) & (y < plot.height) & (x > 10) & (x < plot.width)
+
+    def visible(self, plot, vowelMode, stressFiltered):
+        # returns the vowels to display (in the same order as plot.vowButtons)
+        # plot.arpDisplayed/altDisplayed: arpabet/celex vowels displayed (combined
+        #   as their union or intersection depending on vowelMode)
+        # plot.filtered: vowels filtered by duration or word
+        # stressFiltered: stress values not displayed
+        self.setTokens(plot.vowButtons, plot.store)
+        n = len(self.tokens)
+        arp = self.mask('arpabet', list(plot.arpDisplayed), lambda: self.inColumn('name', plot.arpDisplayed))
+        alt = self.mask('celex', list(plot.altDisplayed), lambda: self.inColumn('altVow', plot.altDisplayed))
+        stress = self.mask('stress', list(stressFiltered), lambda: ~self.inColumn('stress', stressFiltered))
+        def notFiltered():
+            filtered = set(map(id, plot.filtered))
+            return np.fromiter((id(t) not in filtered for t in self.tokens), dtype = bool, count = n)
+        kept = self.mask('filtered', list(plot.filtered), notFiltered)
+        # vowels inside the plot (changes when zooming or resizing the window)
+        inPlot = self.mask('viewport', (plot.layout.transform, plot.width, plot.height), lambda: self.inPlot(plot))
+        shown = (arp & alt) if vowelMode == 'intersect' else (arp | alt)
+        shown = shown & stress & kept & inPlot
+        return [self.tokens[i] for i in np.flatnonzero(shown)]
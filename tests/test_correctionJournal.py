@@ -0,0 +1,86 @@
+import os, sys, shutil, tempfile, unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_scripts'))
+import correctionJournal
+
+class RecoverTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def journal(self):
+        return correctionJournal.CorrectionJournal(self.folder, 'me')
+
+    def testNoJournal(self):
+        self.assertEqual(self.journal().recover(), [])
+
+    def testRecover(self):
+        with open(os.path.join(self.folder, '.me-1-journal.csv'), 'wb') as f: # left by a plotmish that crashed
+            f.write('append,False,.\n')
+            f.write('+,a.wav,a-1,EH,.\n')
+            f.write('+,a.wav,a-2,IY,.\n')
+            f.write('+,b.wav,b-7,AE,.\n')
+            f.write('-,a.wav,.\n') # a-2 taken back
+            f.write('+,b.wav,b-8,A') # only partly written
+        open(os.path.join(self.folder, '.me-you-1-journal.csv'), 'wb').write('append,False,.\n+,c.wav,c-1,EH,.\n') # (annotator me-you)
+        journal = self.journal()
+        self.assertEqual(journal.recover(), [({'a.wav': [['a-1', 'EH']], 'b.wav': [['b-7', 'AE']]}, False)])
+        journal.begin(True)
+        journal.stop()
+        self.assertEqual(os.listdir(self.folder), ['.me-you-1-journal.csv'])
+
+    def testRunningJournalIsKept(self):
+        # the journal of a plotmish that is still running isn't recovered (or written over)
+        running = self.journal()
+        running.begin(False)
+        running.add('a.wav', ['a-1', 'EH'])
+        running.save(lambda: None)
+        running.add('a.wav', ['a-2', 'IY'])
+        other = self.journal()
+        self.assertEqual(other.recover(), [])
+        running.stop()
+
+    def testStopDeletesJournal(self):
+        journal = self.journal()
+        journal.begin(True)
+        journal.add('a.wav', ['a-1', 'EH'])
+        journal.stop()
+        self.assertFalse(os.path.exists(journal.path))
+
+    def testFailedSaveIsKept(self):
+        # changes of a save that failed are recovered the next time
+        def fail(): raise IOError('disk full')
+        journal = self.journal()
+        journal.begin(False)
+        journal.add('a.wav', ['a-1', 'EH'])
+        journal.save(fail)
+        journal.add('a.wav', ['a-2', 'IY'])
+        stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+        try:
+            journal.stop()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(self.journal().recover(), [({'a.wav': [['a-1', 'EH'], ['a-2', 'IY']]}, False)])
+
+    def testFailedSaveIsRetried(self):
+        saved = []
+        def fail():
+            if not saved:
+                saved.append('failed')
+                raise IOError('database is locked')
+            saved.append('first')
+        journal = self.journal()
+        journal.begin(False)
+        stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+        try:
+            journal.save(fail)
+            journal.save(lambda: saved.append('second'))
+            journal.stop()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(saved, ['failed', 'first', 'second'])
+        self.assertFalse(os.path.exists(journal.path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os, sys, shutil, tempfile, unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_scripts'))
+import correctionStore
+
+def line(token, F1, note = None):
+    # log line as in plot.allLogs
+    return ['s01-%d' % token, 'EH', 'WORD', '1.0', '1.1', '64', '1', '5', '500.0', F1, '1500.0', '1510.0'] + ([note] if note else [])
+
+class RowsTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = correctionStore.CorrectionStore(self.folder)
+        self.logFile = os.path.join(self.folder, 's01-corrLog.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def writeLog(self, *lines):
+        with open(self.logFile, 'wb') as f:
+            f.write(','.join(correctionStore.header) + '\n')
+            for l in lines: f.write(l + '\n')
+
+    def testLatest(self):
+        self.writeLog()
+        self.store.add('s01', 'me', [line(3, '510.0'), line(5, '520.0')], self.logFile)
+        self.store.add('s01', 'you', [line(3, '530.0', 'bad')], self.logFile)
+        rows = self.store.rows('s01')
+        self.assertEqual([(r[0], r[1], r[10]) for r in rows], [('me', '3', '510.0'), ('me', '5', '520.0'), ('you', '3', '530.0')])
+        latest = self.store.rows('s01', latest = True)
+        self.assertEqual([(r[0], r[1], r[10]) for r in latest], [('me', '5', '520.0'), ('you', '3', '530.0')])
+        self.assertEqual(latest[1][13], 'bad') # note of a removed vowel
+        self.assertEqual(len(latest[0]), 13) # no note
+
+    def testImportCsv(self):
+        self.writeLog('me,3,EH,WORD,1.0,1.1,64,1,5,500.0,510.0,1500.0,1510.0',
+                      'you,3,EH,WORD,1.0,1.1,64,1,5,500.0,530.0,1500.0,1510.0')
+        self.store.importCsv('s01', self.logFile)
+        self.assertEqual(self.store.rows('s01', latest = True), [['you', '3', 'EH', 'WORD', '1.0', '1.1', '64', '1', '5', '500.0', '530.0', '1500.0', '1510.0']])
+
+    def testCurrent(self):
+        self.writeLog('me,3,EH,WORD,1.0,1.1,64,1,5,500.0,510.0,1500.0,1510.0')
+        self.assertFalse(self.store.current('s01', self.logFile))
+        self.assertFalse(os.path.exists(self.store.path)) # not made just to look
+        self.store.importCsv('s01', self.logFile)
+        self.assertTrue(self.store.current('s01', self.logFile))
+        # the log file was edited outside plotmish
+        self.writeLog('me,4,EH,WORD,1.0,1.1,64,1,5,500.0,510.0,1500.0,1510.0')
+        os.utime(self.logFile, (0, 0))
+        self.assertFalse(self.store.current('s01', self.logFile))
+        self.store.importCsv('s01', self.logFile)
+        self.assertEqual([r[1] for r in self.store.rows('s01')], ['4'])
+        os.remove(self.logFile)
+        self.assertFalse(self.store.current('s01', self.logFile))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_scripts'))
+import undoJournal
+
+class ListTest(unittest.TestCase):
+    def testRemoveAt(self):
+        self.assertEqual(undoJournal.removeAt(list('abcde'), [0, 2, 4]), list('bd'))
+        self.assertEqual(undoJournal.removeAt(list('abc'), []), list('abc'))
+
+    def testInsertAt(self):
+        self.assertEqual(undoJournal.insertAt(list('bd'), [(0, 'a'), (2, 'c'), (4, 'e')]), list('abcde'))
+        self.assertEqual(undoJournal.insertAt([], [(0, 'a'), (1, 'b')]), list('ab'))
+
+    def testInsertUndoesRemove(self):
+        items = list('abcdefg')
+        positions = [1, 2, 5]
+        removed = undoJournal.removeAt(items, positions)
+        self.assertEqual(undoJournal.insertAt(removed, [(p, items[p]) for p in positions]), items)
+
+class SpillStackTest(unittest.TestCase):
+    def testOrder(self):
+        # items written to the file come back in order
+        stack = undoJournal.SpillStack(2)
+        for i in range(5): stack.push(i)
+        self.assertEqual(len(stack), 5)
+        self.assertEqual([stack.pop() for i in range(6)], [4, 3, 2, 1, 0, None])
+
+    def testPushAfterPop(self):
+        stack = undoJournal.SpillStack(1)
+        for i in range(4): stack.push(i)
+        self.assertEqual(stack.pop(), 3)
+        self.assertEqual(stack.pop(), 2)
+        stack.push('x')
+        stack.push('y')
+        self.assertEqual([stack.pop() for i in range(5)], ['y', 'x', 1, 0, None])
+
+    def testClear(self):
+        stack = undoJournal.SpillStack(1)
+        for i in range(3): stack.push(i)
+        stack.clear()
+        self.assertEqual(len(stack), 0)
+        self.assertEqual(stack.pop(), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#checks that visibility.Visibility displays the same vowels as the list
+#comprehensions it replaced in the plotmish main loop
+import os, sys, random, unittest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_scripts'))
+import numpy as np
+import tokenStore, tokenLayer, plotmishClasses, visibility
+
+arpVowels = ['IY', 'IH', 'EH', 'AE', 'AH', 'AA', 'AO', 'UH', 'UW', 'ER']
+altVowels = ['i', 'I', 'E', '{', 'V', 'A', 'O', 'U', 'u', '3']
+
+def makeTable(n, rand):
+    # table of n random vowel tokens like the ones tokenStore.readFormantFile returns
+    table = {c: np.zeros((n,)+s, dtype = t) for c,(t,s) in tokenStore.numericColumns.items()}
+    table['F1'][:] = [rand.uniform(200, 1000) for i in range(n)]
+    table['F2'][:] = [rand.uniform(600, 3000) for i in range(n)]
+    table['num'][:] = np.arange(1, n+1)
+    text = {'name': [rand.choice(arpVowels) for i in range(n)],
+            'altVow': [rand.choice(altVowels) for i in range(n)],
+            'stress': [rand.choice('012') for i in range(n)]}
+    for c in tokenStore.categoryColumns:
+        table[c], table[c+'Vocab'] = tokenStore.encode(text.get(c, ['']*n))
+    return table
+
+def locate(F1, F2, transform):
+    # screen location of the vowels (transform is (zoom, shift))
+    zoom, shift = transform
+    return (3000 - F2)*zoom/4 - shift, (F1 - 200)*zoom/2 - shift
+
+class Plot(object):
+    # the parts of plotmishClasses.vowelPlot that Visibility uses
+    def __init__(self, store):
+        self.store = store
+        self.layout = tokenLayer.Layout(store, locate, (8,8))
+        self.layout.setTransform((1.0, 0))
+        self.width, self.height = 600, 400
+        self.vowButtons = [plotmishClasses.vowelView(store, i) for i in range(len(store))]
+        self.arpDisplayed, self.altDisplayed, self.filtered = [], [], []
+
+def expected(plot, vowelMode, stressFiltered):
+    # the vowels displayed by the old main loop
+    def inPlot(v):
+        x, y = plot.layout.locations()[v.index]
+        return y > 10 and y < plot.height and x > 10 and x < plot.width
+    if vowelMode == 'intersect':
+        shown = [v for v in plot.vowButtons if v.name in plot.arpDisplayed and v.altVow in plot.altDisplayed]
+    else:
+        shown = [v for v in plot.vowButtons if v.name in plot.arpDisplayed or v.altVow in plot.altDisplayed]
+    shown = [v for v in shown if v not in plot.filtered]
+    return [v for v in shown if v.stress not in stressFiltered and inPlot(v)]
+
+class VisibilityTest(unittest.TestCase):
+    def testRandomCombinations(self):
+        rand = random.Random(1)
+        store = tokenStore.TokenStore()
+        store.extend('a.wav', makeTable(300, rand))
+        plot = Plot(store)
+        vis = visibility.Visibility()
+        for i in range(200):
+            change = rand.randrange(6)
+            if change == 0: # remove vowels
+                for v in rand.sample(plot.vowButtons, 5): plot.vowButtons.remove(v)
+            elif change == 1: # remeasure a vowel (a new row at the end)
+                v = rand.choice(plot.vowButtons)
+                new = plotmishClasses.vowelView(store, store.append(v.index, F1 = rand.uniform(200, 1000)))
+                plot.vowButtons = [b for b in plot.vowButtons if b is not v] + [new]
+            elif change == 2: # zoom
+                plot.layout.setTransform((rand.choice([1.0, 1.5, 2.0]), rand.choice([0, 50, 100])))
+            elif change == 3: # filter
+                plot.filtered = rand.sample(plot.vowButtons, rand.randrange(20))
+            plot.arpDisplayed = rand.sample(arpVowels, rand.randrange(len(arpVowels)))
+            plot.altDisplayed = rand.sample(altVowels, rand.randrange(3))
+            stressFiltered = rand.sample('012', rand.randrange(3))
+            vowelMode = rand.choice(['union', 'intersect'])
+            self.assertEqual(vis.visible(plot, vowelMode, stressFiltered), expected(plot, vowelMode, stressFiltered))
+
+    def testUnchangedMasksAreKept(self):
+        store = tokenStore.TokenStore()
+        store.extend('a.wav', makeTable(50, random.Random(2)))
+        plot = Plot(store)
+        plot.arpDisplayed = ['IY']
+        vis = visibility.Visibility()
+        vis.visible(plot, 'union', [])
+        arpabet = vis.masks['arpabet']
+        plot.altDisplayed = ['i']
+        vis.visible(plot, 'union', [])
+        self.assertIs(vis.masks['arpabet'], arpabet)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,4 @@
-import argparse, os, glob, subprocess, sys
+import argparse, os, subprocess, sys
 
 pj,bn = os.path.join, os.path.basename
 
@@ -10,18 +10,27 @@ args = parser.parse_args()
 
 if os.path.isdir('plotmish'):
     os.chdir('plotmish')
+sys.path.append('support_scripts')
+import corpusManifest, correctionStore
 
-## get log files
+## lists of the files in the log and formant.txt folders
+manifest = corpusManifest.Manifest('cache')
+
+## get log files (the corrections of a log file that the corrections database has are read from it instead)
+store = None
 if os.path.isdir(args.l):
-	logs = glob.glob(pj(args.l, '*'))
+	logFiles = manifest.scan(args.l)
+	logs = sorted(logFiles['log'].values() + [o for o in logFiles['other'].values() if not bn(o).startswith(correctionStore.dbName)])
+	store = correctionStore.CorrectionStore(args.l)
 else:
 	logs = [args.l]
 
-## get formant.txt files to be corrected
+## get formant.txt files to be corrected (by recording id)
 if os.path.isdir(args.formant_files):
-	oldF = glob.glob(pj(args.formant_files,'*'))
+	oldF = manifest.scan(args.formant_files)['formant']
 else:
-	oldF = [args.formant_files]
+	oldF = {corpusManifest.recordingId(args.formant_files)[1]: args.formant_files}
+manifest.save()
 
 ## make directory to write out files if it doesn't exist
 if not os.path.isdir(args.c):
@@ -46,16 +55,11 @@ for l in logs:
 	name = bn(l).rsplit('-',1)
 	
 	## check that file is named correctly
-	if name[1] != 'corrLog.csv':
+	if name[-1] != 'corrLog.csv':
 		print >> sys.stderr, 'Log file %r does not end in -corrLog.csv.  File may have been renamed \nskipping...' %bn(l)
 		continue
 
-	oldForms = []
-	for o in oldF:
-		formName = bn(o).rsplit('-',1)
-		try: 
-			oldForms += [o] if formName[0] == name[0] and formName[1] == 'formant.txt' else []
-		except: pass
+	oldForms = [oldF[name[0]]] if name[0] in oldF else []
 
 	##check that file corresponds to a formant.txt file
 	if not oldForms:
@@ -98,9 +102,12 @@ for l in logs:
 		print >> sys.stderr, 'Mandatory Headings not found','for file: '+ basename(oldForms[0])+'\nCannot write to file, continuing...'
 		continue
 	## extract logFile info to a list
-	logFile = open(l,'rU')
-	logList = [o.replace('\n','').split(',') for o in logFile.readlines()]
-	logFile.close()
+	if store and store.current(name[0], l):
+		logList = [correctionStore.header] + store.rows(name[0])
+	else:
+		logFile = open(l,'rU')
+		logList = [o.replace('\n','').split(',') for o in logFile.readlines()]
+		logFile.close()
 	## correct formant files
 	for ll in logList[1:]:
 		number = int(ll[1])